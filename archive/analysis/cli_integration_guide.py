@@ -15,84 +15,124 @@ system into the existing Filing Assistant CLI for better user experience.
 📋 IMPLEMENTATION STEPS:
 """
 
+import hashlib
 import json
 import os
-from typing import Dict, Any, Optional
+import sys
+from typing import Dict, Any, Optional, Tuple
 from enhanced_header_detector import EnhancedHeaderDetector
+from fast_json import load_sheet
+
+# Detection results keyed by (sheet_hash, file_name); bounded to keep memory in check
+_DETECT_CACHE: Dict[Tuple[str, str], Dict[str, Any]] = {}
+_DETECT_CACHE_MAX = 512
+
+def hash_sheet(sheet_data: Dict[str, Any]) -> str:
+    """Stable content hash of a sheet (canonical JSON, sorted keys)."""
+    canonical = json.dumps(sheet_data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def detect_headers_cached(detector: EnhancedHeaderDetector, sheet_data: Dict[str, Any],
+                          file_name: str, sheet_hash: Optional[str] = None) -> Dict[str, Any]:
+    """Run detect_headers_enhanced once per (sheet content, file name).
+    
+    Pass sheet_hash when the caller already computed it to avoid re-hashing."""
+    key = (sheet_hash or hash_sheet(sheet_data), file_name)
+    if key not in _DETECT_CACHE:
+        if len(_DETECT_CACHE) >= _DETECT_CACHE_MAX:
+            # Evict the oldest entry (dicts keep insertion order)
+            _DETECT_CACHE.pop(next(iter(_DETECT_CACHE)))
+        _DETECT_CACHE[key] = detector.detect_headers_enhanced(sheet_data, file_name)
+    return _DETECT_CACHE[key]
 
 def demonstrate_cli_integration():
     """Show how enhanced headers improve CLI experience."""
     
-    print("🚀 Enhanced Header Detection - CLI Integration Demo")
-    print("=" * 60)
+    # Collect output and write each static block at once instead of one print per line.
+    # The buffer is flushed before every detector call, so the detector's own messages
+    # appear in order and the demo shows progress before any network round-trip
+    out = []
+    put = out.append
     
-    # Initialize enhanced detector
-    detector = EnhancedHeaderDetector()
+    def flush():
+        if out:
+            sys.stdout.write("\n".join(out) + "\n")
+            out.clear()
     
-    # Load a sample file for demonstration
-    sample_file = "training_files2/(AppliedMat) External CPT Filled_structured.json"
+    try:
+        put("🚀 Enhanced Header Detection - CLI Integration Demo")
+        put("=" * 60)
+        flush()
     
-    if not os.path.exists(sample_file):
-        print("❌ Sample file not found for demonstration")
-        return
+        # Initialize enhanced detector
+        detector = EnhancedHeaderDetector()
     
-    with open(sample_file, 'r') as f:
-        file_data = json.load(f)
+        # Load a sample file for demonstration
+        sample_file = "training_files2/(AppliedMat) External CPT Filled_structured.json"
     
-    # Demonstrate for one sheet
-    sheet_name = "Bid Template (1 year proposal)"
-    if sheet_name not in file_data:
-        sheet_name = list(file_data.keys())[0]
+        if not os.path.exists(sample_file):
+            put("❌ Sample file not found for demonstration")
+            return
     
-    sheet_data = file_data[sheet_name]
+        # Demonstrate for one sheet, falling back to the first sheet in the file
+        found = load_sheet(sample_file, "Bid Template (1 year proposal)")
+        if found is None:
+            put("❌ Sample file contains no sheets")
+            return
+        sheet_name, sheet_data = found
+        columns = sheet_data.get('columns', [])
+        n_cols = len(columns)
     
-    print(f"\n📄 File: (AppliedMat) External CPT Filled")
-    print(f"📋 Sheet: {sheet_name}")
-    print(f"📏 Columns: {len(sheet_data.get('columns', []))}")
+        put(f"\n📄 File: (AppliedMat) External CPT Filled")
+        put(f"📋 Sheet: {sheet_name}")
+        put(f"📏 Columns: {n_cols}")
     
-    # Show BEFORE - generic headers
-    print(f"\n🔴 BEFORE - Generic Headers:")
-    generic_headers = sheet_data.get('columns', [])[:8]
-    for i, header in enumerate(generic_headers):
-        print(f"   [{i:2d}] {header}")
-    if len(sheet_data.get('columns', [])) > 8:
-        print(f"   ... and {len(sheet_data.get('columns', [])) - 8} more generic headers")
+        # Show BEFORE - generic headers
+        put(f"\n🔴 BEFORE - Generic Headers:")
+        for i, header in enumerate(columns[:8]):
+            put(f"   [{i:2d}] {header}")
+        if n_cols > 8:
+            put(f"   ... and {n_cols - 8} more generic headers")
     
-    # Run enhanced detection
-    print(f"\n🔄 Running Enhanced Detection...")
-    try:
-        result = detector.detect_headers_enhanced(sheet_data, sample_file)
+        # Run enhanced detection
+        put(f"\n🔄 Running Enhanced Detection...")
+        flush()
+        try:
+            result = detect_headers_cached(detector, sheet_data, sample_file)
         
-        # Show AFTER - enhanced headers
-        print(f"\n🟢 AFTER - Enhanced Headers:")
-        final_mapping = result.get('final_mapping', {})
-        confidence = result.get('confidence', 0)
+            # Show AFTER - enhanced headers
+            put(f"\n🟢 AFTER - Enhanced Headers:")
+            final_mapping = result.get('final_mapping', {})
+            confidence = result.get('confidence', 0)
         
-        if final_mapping:
-            print(f"   🎯 Confidence: {confidence:.1%}")
+            if final_mapping:
+                put(f"   🎯 Confidence: {confidence:.1%}")
             
-            # Show enhanced headers with mapping
-            for i, col_key in enumerate(list(final_mapping.keys())[:8]):
-                enhanced_header = final_mapping[col_key]
-                generic_header = sheet_data['columns'][i] if i < len(sheet_data['columns']) else f"col_{i}"
-                print(f"   [{i:2d}] {enhanced_header:<30} (was: {generic_header})")
+                # Show enhanced headers with mapping
+                n_mapped = len(final_mapping)
+                for i, enhanced_header in enumerate(list(final_mapping.values())[:8]):
+                    generic_header = columns[i] if i < n_cols else f"col_{i}"
+                    put(f"   [{i:2d}] {enhanced_header:<30} (was: {generic_header})")
             
-            if len(final_mapping) > 8:
-                print(f"   ... and {len(final_mapping) - 8} more enhanced headers")
+                if n_mapped > 8:
+                    put(f"   ... and {n_mapped - 8} more enhanced headers")
             
-            # Show improvement summary
-            print(f"\n📊 Improvement Summary:")
-            print(f"   • Enhanced headers detected: {len(final_mapping)}")
-            print(f"   • AI confidence level: {confidence:.1%}")
-            print(f"   • Business domain terms: ✅")
-            print(f"   • Semantic clarity: ✅")
+                # Show improvement summary
+                put(f"\n📊 Improvement Summary:")
+                put(f"   • Enhanced headers detected: {n_mapped}")
+                put(f"   • AI confidence level: {confidence:.1%}")
+                put(f"   • Business domain terms: ✅")
+                put(f"   • Semantic clarity: ✅")
             
-        else:
-            print(f"   ❌ No enhanced headers detected")
-            print(f"   📊 Candidates evaluated: {len(result.get('candidates', []))}")
+            else:
+                put(f"   ❌ No enhanced headers detected")
+                put(f"   📊 Candidates evaluated: {len(result.get('candidates', []))}")
     
-    except Exception as e:
-        print(f"   💥 Detection error: {e}")
+        except Exception as e:
+            put(f"   💥 Detection error: {e}")
+    finally:
+        flush()
+
 
 def show_cli_integration_code():
     """Show example code for integrating enhanced headers into existing CLI."""
@@ -104,25 +144,58 @@ def show_cli_integration_code():
     integration_code = '''
 # Example integration into existing CLI display functions
 from enhanced_header_detector import EnhancedHeaderDetector
+from cli_integration_guide import detect_headers_cached, hash_sheet
 
 class EnhancedFilingAssistant:
     """Enhanced Filing Assistant with improved header detection."""
     
     def __init__(self):
         self.enhanced_detector = EnhancedHeaderDetector()
+        # file_name -> {sheet_name: detection result}, filled by the display pass
+        self.sheet_results = {}
         # ... existing initialization code
     
+    def detect_sheet(self, sheet_data: Dict[str, Any], file_name: str, sheet_name: str):
+        """Detect headers for a sheet once and remember the result per file."""
+        file_results = self.sheet_results.setdefault(file_name, {})
+        if sheet_name not in file_results:
+            file_results[sheet_name] = detect_headers_cached(
+                self.enhanced_detector, sheet_data, file_name, hash_sheet(sheet_data)
+            )
+        return file_results[sheet_name]
+    
+    def detect_file(self, file_data: Dict[str, Any], file_name: str):
+        """Detect headers for every sheet of a file with one batched OpenAI request."""
+        file_results = self.sheet_results.setdefault(file_name, {})
+        pending = {name: data for name, data in file_data.items() if name not in file_results}
+        if pending:
+            file_results.update(
+                self.enhanced_detector.detect_headers_enhanced_batch(pending, file_name)
+            )
+        return file_results
+    
+    def invalidate(self, file_name: str):
+        """Forget detection results for a file, e.g. after it is reloaded."""
+        # Content-keyed results in detect_headers_cached stay valid: edited
+        # sheets hash differently
+        self.sheet_results.pop(file_name, None)
+    
     def display_file_structure_enhanced(self, file_data: Dict[str, Any], file_name: str):
         """Display file structure with enhanced headers when available."""
         
+        # Validate all sheets in one round-trip; sheets left out fall back to
+        # per-sheet detection below
+        try:
+            self.detect_file(file_data, file_name)
+        except Exception as e:
+            print(f"⚠️ Batched detection failed, detecting sheets one by one: {e}")
+        
         for sheet_name, sheet_data in file_data.items():
             print(f"\\n📋 Sheet: {sheet_name}")
             
             # Get enhanced headers
             try:
-                enhanced_result = self.enhanced_detector.detect_headers_enhanced(
-                    sheet_data, file_name
-                )
+                enhanced_result = self.detect_sheet(sheet_data, file_name, sheet_name)
                 
                 final_mapping = enhanced_result.get('final_mapping', {})
                 confidence = enhanced_result.get('confidence', 0)
@@ -152,11 +225,12 @@ class EnhancedFilingAssistant:
                 self.display_file_structure_standard(sheet_data)
     
     def get_column_reference_enhanced(self, sheet_data: Dict[str, Any], 
-                                    file_name: str) -> Dict[str, str]:
+                                    file_name: str, sheet_name: str) -> Dict[str, str]:
         """Get enhanced column references for user interaction."""
         
         try:
-            result = self.enhanced_detector.detect_headers_enhanced(sheet_data, file_name)
+            # Reuses the result from display_file_structure_enhanced when available
+            result = self.detect_sheet(sheet_data, file_name, sheet_name)
             final_mapping = result.get('final_mapping', {})
             
             if final_mapping and result.get('confidence', 0) > 0.6:
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Fast JSON loading helpers for the analysis scripts.
+
+Uses ijson to stream only the parts of large *_structured.json files that a
+script needs, and orjson when a whole document has to be decoded. Both are
+optional; the stdlib json module is used when they are not installed.
+"""
+
+import json
+import mmap
+import os
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    ijson = None
+    IJSON_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+# Parsed results keyed by (path, what was read) -> (mtime_ns, value)
+_JSON_CACHE: Dict[Tuple[str, Any], Tuple[int, Any]] = {}
+
+# Large reads keep syscall count low on multi-MB structured files
+READ_BUFFER_SIZE = 4 * 1024 * 1024
+
+def open_big(path: str):
+    """Open a file for binary reading with a large read-ahead buffer."""
+    return open(path, 'rb', buffering=READ_BUFFER_SIZE)
+
+def _decode_whole(f) -> Any:
+    """Decode an entire open file, memory-mapping it for orjson to skip a bytes copy."""
+    if not ORJSON_AVAILABLE:
+        return json.load(f)
+    try:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        # Empty files cannot be mapped; let the decoder report the error
+        return orjson.loads(f.read())
+    with mm, memoryview(mm) as view:
+        return orjson.loads(view)
+
+def load_json_fast(path: str, prefix: Optional[str] = None) -> Any:
+    """Load a JSON document, or only the value under a dotted `prefix` (e.g. 'statistics').
+
+    Returns None when the prefix does not exist."""
+    with open_big(path) as f:
+        if prefix and IJSON_AVAILABLE:
+            for item in ijson.items(f, prefix, use_float=True, buf_size=READ_BUFFER_SIZE):
+                return item
+            return None
+        data = _decode_whole(f)
+
+    if prefix:
+        for key in prefix.split('.'):
+            if not isinstance(data, dict) or key not in data:
+                return None
+            data = data[key]
+    return data
+
+def iter_top_level(path: str) -> Iterator[Tuple[str, Any]]:
+    """Yield (key, value) pairs of the top-level object, streaming when ijson is available.
+
+    Callers can stop iterating as soon as they find the entry they need."""
+    if IJSON_AVAILABLE:
+        with open_big(path) as f:
+            yield from ijson.kvitems(f, '', use_float=True, buf_size=READ_BUFFER_SIZE)
+    else:
+        yield from load_json_fast(path).items()
+
+def _cached(path: str, key: Any, loader: Callable[[], Any]) -> Any:
+    """Return loader()'s value, reusing it until the file's modification time changes."""
+    mtime_ns = os.stat(path).st_mtime_ns
+    entry = _JSON_CACHE.get((path, key))
+    if entry is not None and entry[0] == mtime_ns:
+        return entry[1]
+    value = loader()
+    _JSON_CACHE[(path, key)] = (mtime_ns, value)
+    return value
+
+def load_structured(path: str, prefix: Optional[str] = None) -> Any:
+    """load_json_fast(), parsed once per file version."""
+    return _cached(path, ('prefix', prefix), lambda: load_json_fast(path, prefix))
+
+def load_sheet(path: str, sheet_name: str) -> Optional[Tuple[str, Any]]:
+    """Return (sheet_name, sheet_data), falling back to the file's first sheet.
+
+    Streams only as far as the requested sheet and caches the result per file version.
+    Returns None when the file has no sheets."""
+    def find():
+        first_sheet = None
+        for name, data in iter_top_level(path):
+            if name == sheet_name:
+                return name, data
+            if first_sheet is None:
+                first_sheet = (name, data)
+        return first_sheet
+    
+    return _cached(path, ('sheet', sheet_name), find)
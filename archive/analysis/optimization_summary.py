@@ -47,9 +47,14 @@ Decision Learning:
 The system is now ready for production use with continuous learning capabilities!
 """
 
-import json
 import os
-from enhanced_header_detector import EnhancedHeaderDetector
+import sys
+
+PROJECT_DIR = "/home/ubuntu/MyProject/filling_assistant"
+sys.path.insert(0, PROJECT_DIR)
+
+from filing_assistant.enhanced_header_detector import OPENAI_AVAILABLE, read_decision_history
+from fast_json import load_structured
 
 def show_optimization_summary():
     """Display comprehensive optimization results."""
@@ -60,9 +65,9 @@ def show_optimization_summary():
     print("🔍 DETAILED PERFORMANCE ANALYSIS")
     print("="*80)
     
-    # Load decision history to show learning progress
-    detector = EnhancedHeaderDetector()
-    history = detector.decision_history
+    # Load decision history to show learning progress; no detector (or
+    # OpenAI client) is needed just to read it
+    history = read_decision_history()
     
     print(f"\n📚 Learning Progress:")
     print(f"   • Total AI decisions: {history.get('metadata', {}).get('total_decisions', 0)}")
@@ -94,10 +99,8 @@ def show_optimization_summary():
     mappings_file = "training_files2/enhanced_header_mappings.json"
     if os.path.exists(mappings_file):
         try:
-            with open(mappings_file, 'r') as f:
-                mappings = json.load(f)
-            
-            stats = mappings.get('statistics', {})
+            # Only the statistics block is needed, not the per-file mappings
+            stats = load_structured(mappings_file, prefix='statistics') or {}
             total_sheets = stats.get('total_sheets_processed', 0)
             generic_headers = stats.get('sheets_with_generic_headers', 0)
             
@@ -111,7 +114,9 @@ def show_optimization_summary():
             print(f"   ⚠️ Could not load mapping statistics: {e}")
     
     print(f"\n🚀 System Status:")
-    if detector.openai_client:
+    # Same condition the detector uses to create its OpenAI client; importing the
+    # detector module has already loaded .env
+    if OPENAI_AVAILABLE and os.getenv('OPENAI_API_KEY'):
         print(f"   ✅ OpenAI Integration: ACTIVE")
         print(f"   ✅ Self-Learning: ENABLED")
         print(f"   ✅ 5-Strategy Detection: OPERATIONAL")
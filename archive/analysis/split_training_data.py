@@ -6,9 +6,46 @@ Ensures balanced distribution across different companies and file types
 
 import os
 import random
+import re
 import shutil
 from pathlib import Path
 from collections import defaultdict
+from typing import List
+from concurrent.futures import ThreadPoolExecutor
+
+# Captures "(Company)" prefixes, or the "4." filled / "1." empty numbering schemes
+_COMPANY_RE = re.compile(r"^(?P<co>\([^)]*\))|^(?P<filled>4\.)|^(?P<empty>1\.)")
+
+def company_for(name: str) -> str:
+    """Return the company/type group for a training file name."""
+    m = _COMPANY_RE.match(name)
+    if not m:
+        return "other"
+    if m["co"]:
+        return m["co"]
+    return "filled_files" if m["filled"] else "empty_files"
+
+def place_file(src: Path, dst: Path):
+    """Hardlink src to dst, copying when a link is not possible (e.g. across devices)."""
+    # Replace any file left by a previous split so reruns are idempotent
+    if dst.exists():
+        dst.unlink()
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+def place_files(files: List[Path], dest_dir: Path):
+    """Place files into dest_dir, overlapping the filesystem calls with a thread pool."""
+    # Pool startup costs more than it saves for a handful of files
+    if len(files) < 16:
+        for file in files:
+            place_file(file, dest_dir / file.name)
+        return
+    
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+        # list() surfaces any exception raised in a worker
+        list(executor.map(lambda file: place_file(file, dest_dir / file.name), files))
 
 def main():
     # Set random seed for reproducible splits
@@ -29,18 +66,7 @@ def main():
     # Group files by company/type to ensure balanced split
     company_groups = defaultdict(list)
     for file in json_files:
-        # Extract company name from filename
-        name = file.name
-        if name.startswith("(") and ")" in name:
-            company = name.split(")")[0] + ")"
-        elif name.startswith("4."):
-            company = "filled_files"
-        elif name.startswith("1."):
-            company = "empty_files"
-        else:
-            company = "other"
-        
-        company_groups[company].append(file)
+        company_groups[company_for(file.name)].append(file)
     
     # Split each company group 70/30
     train_files = []
@@ -59,14 +85,12 @@ def main():
         
         print(f"  {company}: {len(company_train)} train, {len(company_test)} test")
     
-    # Copy files to respective directories
-    print(f"\n📁 Copying {len(train_files)} files to train_set/")
-    for file in train_files:
-        shutil.copy2(file, train_dir / file.name)
+    # Link (or copy) files to respective directories
+    print(f"\n📁 Placing {len(train_files)} files in train_set/")
+    place_files(train_files, train_dir)
     
-    print(f"📁 Copying {len(test_files)} files to test_set/")
-    for file in test_files:
-        shutil.copy2(file, test_dir / file.name)
+    print(f"📁 Placing {len(test_files)} files in test_set/")
+    place_files(test_files, test_dir)
     
     # Summary
     total_files = len(train_files) + len(test_files)
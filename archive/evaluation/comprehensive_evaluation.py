@@ -1,92 +1,115 @@
 #!/usr/bin/env python3
 
+import hashlib
 import json
+import mmap
 import os
-import subprocess
+import re
 import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
-def run_identify(file_path: str, sheet_name: str = None) -> Dict:
-    """Run the identify command and parse results."""
-    cmd = [
-        sys.executable, "-m", "filing_assistant.cli", "identify",
-        "--file", file_path,
-        "--store", "patterns_store.json",
-        "--enhanced-headers"
-    ]
-    
-    if sheet_name:
-        cmd.extend(["--sheet", sheet_name])
-    
+PROJECT_DIR = "/home/ubuntu/MyProject/filling_assistant"
+sys.path.insert(0, PROJECT_DIR)
+
+from filing_assistant.enhanced_header_detector import take_pending_decisions, merge_decision_history
+from filing_assistant.store import dump_json, read_json
+from identify_worker import init_worker, run_identify
+
+try:
+    from blake3 import blake3 as _content_hasher
+except ImportError:
+    _content_hasher = hashlib.sha256
+
+# Bump when detection/identification logic changes to invalidate cached results
+DETECTOR_VERSION = "1"
+
+def hash_file(file_path: str) -> str:
+    """Hash file contents (BLAKE3 when available, SHA-256 otherwise)."""
+    with open(file_path, "rb") as f:
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return _content_hasher(mm).hexdigest()
+        except ValueError:
+            # Empty files cannot be memory-mapped
+            return _content_hasher(b"").hexdigest()
+
+def build_manifest(files: List[Path]) -> Dict[str, str]:
+    """Hash files in parallel and return {file name: content hash}."""
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        return dict(zip((f.name for f in files), executor.map(hash_file, map(str, files))))
+
+def load_manifest(path: str) -> Dict[str, str]:
+    """Load a manifest written by a previous run, or {} if there is none."""
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, cwd="/home/ubuntu/MyProject/filling_assistant")
-        return {
-            "success": result.returncode == 0,
-            "stdout": result.stdout,
-            "stderr": result.stderr,
-            "returncode": result.returncode
-        }
-    except Exception as e:
-        return {
-            "success": False,
-            "error": str(e),
-            "stdout": "",
-            "stderr": ""
-        }
+        return read_json(path)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(path: str, manifest: Dict[str, str]):
+    """Write a manifest atomically."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
 
-def parse_identification_results(output: str) -> Dict:
-    """Parse the identification output to extract metrics."""
-    fillable_columns = 0
-    unknown_columns = 0
-    sheets_processed = 0
-    enhanced_enabled = False
+class _EvalCache:
+    """On-disk cache of identification metrics keyed by file content hash."""
     
-    lines = output.split('\n')
-    for line in lines:
-        if "Fillable columns:" in line:
-            try:
-                fillable_columns = int(line.split("Fillable columns:")[1].split()[0])
-            except:
-                pass
-        elif "Unknown columns:" in line:
-            try:
-                unknown_columns = int(line.split("Unknown columns:")[1].split()[0])
-            except:
-                pass
-        elif "Sheets processed:" in line:
+    def __init__(self, path: str, store_path: str):
+        self.path = Path(path)
+        # Results depend on the learned patterns too, so fold the store into the key
+        store_hash = hash_file(store_path) if os.path.exists(store_path) else "no-store"
+        self.suffix = f"{store_hash}:{DETECTOR_VERSION}"
+        self.entries: Dict[str, Dict] = {}
+        if self.path.exists():
             try:
-                sheets_processed = int(line.split("Sheets processed:")[1].split()[0])
-            except:
-                pass
-        elif "Enhanced headers: ENABLED" in line:
-            enhanced_enabled = True
+                with open(self.path, "r") as f:
+                    self.entries = json.load(f)
+            except Exception as e:
+                print(f"⚠️ Could not load evaluation cache: {e}")
     
-    return {
-        "fillable_columns": fillable_columns,
-        "unknown_columns": unknown_columns,
-        "sheets_processed": sheets_processed,
-        "enhanced_enabled": enhanced_enabled,
-        "total_columns": fillable_columns + unknown_columns
-    }
+    def key(self, file_path: str, file_hash: str = None) -> str:
+        return f"{file_hash or hash_file(file_path)}:{self.suffix}"
+    
+    def get(self, key: str) -> Optional[Dict]:
+        return self.entries.get(key)
+    
+    def put(self, key: str, metrics: Dict):
+        self.entries[key] = metrics
+    
+    def save(self):
+        """Write the cache atomically so an interrupted run cannot corrupt it."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+def _evaluate_one(file_path: str) -> Tuple[str, Dict, List]:
+    """Identify a single file inside a worker process, returning the decisions it made."""
+    # Run identification without specifying sheet (auto-detect)
+    metrics = run_identify(file_path)
+    return Path(file_path).name, metrics, take_pending_decisions()
+
+# Known training patterns from our training data
+IN_DOMAIN_PATTERNS = [
+    "APEX", "CPT_Global Air Service", "Customer CPT_2025", "Customer CPT_Zebra", 
+    "Emerson CPT", "Commscope", "AEO CPT", "Corsair"
+]
+
+# One alternation scans each file name once instead of once per pattern
+_IN_DOMAIN_RE = re.compile("|".join(re.escape(p) for p in IN_DOMAIN_PATTERNS))
 
 def categorize_files(files: List[Path]) -> Dict[str, List[Path]]:
     """Categorize files into in-domain vs out-of-domain based on training patterns."""
-    
-    # Known training patterns from our training data
-    in_domain_patterns = [
-        "APEX", "CPT_Global Air Service", "Customer CPT_2025", "Customer CPT_Zebra", 
-        "Emerson CPT", "Commscope", "AEO CPT", "Corsair"
-    ]
-    
     in_domain = []
     out_of_domain = []
     
     for file_path in files:
-        file_name = file_path.name
-        is_in_domain = any(pattern in file_name for pattern in in_domain_patterns)
-        
-        if is_in_domain:
+        if _IN_DOMAIN_RE.search(file_path.name):
             in_domain.append(file_path)
         else:
             out_of_domain.append(file_path)
@@ -96,8 +119,14 @@ def categorize_files(files: List[Path]) -> Dict[str, List[Path]]:
         "out_of_domain": out_of_domain
     }
 
-def test_files(files: List[Path], category: str) -> Dict:
-    """Test a list of files and return aggregated results."""
+def test_files(files: List[Path], category: str, store_path: str, cache: _EvalCache,
+               stream=None, manifest: Dict[str, str] = None) -> Dict:
+    """Test a list of files in parallel and return aggregated results.
+    
+    Files whose content is unchanged since a previous run reuse cached metrics.
+    When `stream` (a binary file) is given, each file's result is appended to it
+    as one JSON line as soon as it arrives. `manifest` supplies precomputed content
+    hashes by file name."""
     print(f"\n🔍 Testing {category.upper()} files ({len(files)} files)")
     print("-" * 60)
     
@@ -107,34 +136,52 @@ def test_files(files: List[Path], category: str) -> Dict:
     successful_tests = 0
     file_results = []
     
-    for file_path in files:
-        print(f"📁 {file_path.name}")
-        
-        # Run identification without specifying sheet (auto-detect)
-        result = run_identify(str(file_path))
+    manifest = manifest or {}
+    keys = [cache.key(str(f), manifest.get(f.name)) for f in files]
+    misses = [str(f) for f, key in zip(files, keys) if cache.get(key) is None]
+    decisions = []
+    
+    with ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=init_worker,
+                             initargs=(store_path,)) as executor:
+        # map() keeps results in input order so the report is deterministic
+        computed = executor.map(_evaluate_one, misses, chunksize=4)
         
-        if result["success"]:
-            metrics = parse_identification_results(result["stdout"])
+        for file_path, key in zip(files, keys):
+            file_name = file_path.name
+            metrics = cache.get(key)
+            if metrics is None:
+                _, metrics, file_decisions = next(computed)
+                decisions.extend(file_decisions)
+                if metrics["success"]:
+                    cache.put(key, metrics)
+            print(f"📁 {file_name}")
             
-            if metrics["total_columns"] > 0:
-                successful_tests += 1
-                total_fillable += metrics["fillable_columns"]
-                total_unknown += metrics["unknown_columns"]
-                total_columns += metrics["total_columns"]
-                
-                rate = (metrics["fillable_columns"] / metrics["total_columns"]) * 100 if metrics["total_columns"] > 0 else 0
-                print(f"   ✅ {metrics['fillable_columns']}/{metrics['total_columns']} fillable ({rate:.1f}%)")
-                
-                file_results.append({
-                    "file": file_path.name,
-                    "fillable": metrics["fillable_columns"],
-                    "total": metrics["total_columns"],
-                    "rate": rate
-                })
+            if metrics["success"]:
+                if metrics["total_columns"] > 0:
+                    successful_tests += 1
+                    total_fillable += metrics["fillable_columns"]
+                    total_unknown += metrics["unknown_columns"]
+                    total_columns += metrics["total_columns"]
+                    
+                    rate = (metrics["fillable_columns"] / metrics["total_columns"]) * 100 if metrics["total_columns"] > 0 else 0
+                    print(f"   ✅ {metrics['fillable_columns']}/{metrics['total_columns']} fillable ({rate:.1f}%)")
+                    
+                    file_results.append({
+                        "file": file_name,
+                        "fillable": metrics["fillable_columns"],
+                        "total": metrics["total_columns"],
+                        "rate": rate
+                    })
+                    if stream is not None:
+                        stream.write(dump_json({"category": category, **file_results[-1]}, indent=False) + b"\n")
+                        stream.flush()
+                else:
+                    print(f"   ⚠️ No columns found")
             else:
-                print(f"   ⚠️ No columns found")
-        else:
-            print(f"   ❌ Failed")
+                print(f"   ❌ Failed")
+    
+    # Single writer: the workers' decisions are added to the history file in one save
+    merge_decision_history(decisions)
     
     return {
         "category": category,
@@ -148,11 +195,22 @@ def test_files(files: List[Path], category: str) -> Dict:
     }
 
 def main():
-    test_dir = Path("/home/ubuntu/MyProject/filling_assistant/test_subset")
+    # Resolve relative paths (decision history, patterns store) as the CLI would
+    os.chdir(PROJECT_DIR)
+    test_dir = Path(PROJECT_DIR) / "test_subset"
+    
+    store_path = "patterns_store.json"
+    cache = _EvalCache(".eval_cache/results.json", store_path)
     
     # Find all files (both empty and filled for comprehensive testing)
     all_files = list(test_dir.glob("*structured.json"))
     
+    # Compare content hashes with the previous run to report what changed
+    manifest_path = ".eval_cache/last_manifest.json"
+    manifest = build_manifest(all_files)
+    last_manifest = load_manifest(manifest_path)
+    changed = [name for name, digest in manifest.items() if last_manifest.get(name) != digest]
+    
     # Categorize files
     categorized = categorize_files(all_files)
     
@@ -161,12 +219,19 @@ def main():
     print(f"Total test files: {len(all_files)}")
     print(f"In-domain files: {len(categorized['in_domain'])}")
     print(f"Out-of-domain files: {len(categorized['out_of_domain'])}")
+    print(f"Changed since last run: {len(changed)}")
     
-    # Test in-domain files
-    in_domain_results = test_files(categorized["in_domain"], "IN-DOMAIN")
+    # Per-file results are streamed as NDJSON so an interrupted run keeps partial results
+    with open("comprehensive_evaluation_results.ndjson", "wb") as stream:
+        # Test in-domain files
+        in_domain_results = test_files(categorized["in_domain"], "IN-DOMAIN", store_path, cache, stream, manifest)
+        
+        # Test out-of-domain files  
+        out_domain_results = test_files(categorized["out_of_domain"], "OUT-OF-DOMAIN", store_path, cache, stream, manifest)
     
-    # Test out-of-domain files  
-    out_domain_results = test_files(categorized["out_of_domain"], "OUT-OF-DOMAIN")
+    # Persist metrics so unchanged files are skipped next run
+    cache.save()
+    save_manifest(manifest_path, manifest)
     
     # Summary
     print("\n" + "=" * 80)
@@ -201,10 +266,11 @@ def main():
     # Top performers
     all_results = in_domain_results["file_results"] + out_domain_results["file_results"]
     all_results.sort(key=lambda x: x["rate"], reverse=True)
+    in_domain_names = {f.name for f in categorized["in_domain"]}
     
     print(f"\n📈 TOP PERFORMING FILES:")
     for i, result in enumerate(all_results[:5]):
-        domain = "IN" if any(result["file"] in f.name for f in categorized["in_domain"]) else "OUT"
+        domain = "IN" if result["file"] in in_domain_names else "OUT"
         print(f"   {i+1}. {result['file']}: {result['fillable']}/{result['total']} ({result['rate']:.1f}%) [{domain}]")
     
     # Save results
@@ -226,10 +292,11 @@ def main():
         }
     }
     
-    with open("/home/ubuntu/MyProject/filling_assistant/comprehensive_evaluation_results.json", "w") as f:
-        json.dump(evaluation_results, f, indent=2)
+    with open("comprehensive_evaluation_results.json", "wb", buffering=1024 * 1024) as f:
+        f.write(dump_json(evaluation_results))
     
     print(f"\n📝 Detailed results saved to: comprehensive_evaluation_results.json")
+    print(f"📝 Per-file results streamed to: comprehensive_evaluation_results.ndjson")
 
 if __name__ == "__main__":
     main()
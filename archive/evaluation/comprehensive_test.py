@@ -5,99 +5,96 @@ on the 30% test set with comparison between enhanced and basic headers
 """
 
 import os
-import json
-import subprocess
+import sys
 import csv
+import atexit
+import shelve
+import argparse
+from operator import itemgetter
 from pathlib import Path
 from datetime import datetime
-import statistics
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+PROJECT_DIR = "/home/ubuntu/MyProject/filling_assistant"
+sys.path.insert(0, PROJECT_DIR)
+
+from filing_assistant.cli import identify_file
+from filing_assistant.enhanced_header_detector import (
+    defer_decision_history, take_pending_decisions, merge_decision_history)
+from filing_assistant.store import dump_json, load_store
+
+# The cli checks for the detector per command now, so check it here the same way
+try:
+    from filing_assistant.enhanced_header_detector import EnhancedHeaderDetector  # noqa: F401
+    ENHANCED_HEADERS_AVAILABLE = True
+except ImportError:
+    ENHANCED_HEADERS_AVAILABLE = False
+
+# Parse the patterns store once and share it across every identification call
+STORE_PATH = os.path.join(PROJECT_DIR, "patterns_store.json")
+STORE = load_store(STORE_PATH)
+
+# Identification results from previous runs, keyed by cache_key()
+CACHE_PATH = os.path.join(PROJECT_DIR, ".test_harness_cache")
+
+def cache_key(file_path, enhanced):
+    """Key a result on the file's path, mtime and size, the patterns store and the mode"""
+    file_stat = os.stat(file_path)
+    store_mtime = os.path.getmtime(STORE_PATH) if os.path.exists(STORE_PATH) else 0
+    return f"{os.path.abspath(file_path)}|{file_stat.st_mtime}|{file_stat.st_size}|{store_mtime}|{enhanced}"
 
 def run_identification(file_path, enhanced=True):
-    """Run identification on a file and return results"""
-    cmd = [
-        "/home/ubuntu/MyProject/filling_assistant/.venv/bin/python", "-m", "filing_assistant.cli", 
-        "identify", 
-        "--file", str(file_path)
-    ]
-    
-    if enhanced:
-        cmd.append("--enhanced-headers")
-    
+    """Run identification on a file in-process and return results"""
     try:
-        result = subprocess.run(
-            cmd, 
-            capture_output=True, 
-            text=True, 
-            cwd="/home/ubuntu/MyProject/filling_assistant"
-        )
-        
-        if result.returncode == 0:
-            return parse_identification_output(result.stdout, enhanced)
-        else:
-            print(f"❌ Error running identification on {file_path}: {result.stderr}")
-            return None
+        result = identify_file(str(file_path), STORE, enhanced_headers=enhanced)
     except Exception as e:
         print(f"❌ Exception running identification on {file_path}: {e}")
         return None
-
-def parse_identification_output(output, enhanced):
-    """Parse the identification output to extract metrics"""
-    lines = output.split('\n')
     
-    result = {
+    if "error" in result:
+        print(f"❌ Error running identification on {file_path}: {result['error']}")
+        return None
+    
+    summary = result.get("summary", {})
+    enhanced_used = enhanced and any(
+        sheet_data.get("header_enhancement", {}).get("enhanced", False)
+        for sheet_data in result.get("sheets", {}).values()
+        if isinstance(sheet_data, dict)
+    )
+    fillable_columns = summary.get("total_fillable_columns", 0)
+    unknown_columns = summary.get("total_unknown_columns", 0)
+    
+    return {
         'enhanced_headers_enabled': enhanced,
-        'enhanced_headers_used': False,
-        'fillable_columns': 0,
-        'unknown_columns': 0,
-        'total_columns': 0,
-        'sheets_processed': 0,
+        'enhanced_headers_used': enhanced_used,
+        'fillable_columns': fillable_columns,
+        'unknown_columns': unknown_columns,
+        'total_columns': fillable_columns + unknown_columns,
+        'sheets_processed': summary.get("sheets_processed", 0),
         'columns_details': [],
-        'header_detector_available': True
+        'header_detector_available': ENHANCED_HEADERS_AVAILABLE
     }
-    
-    # Check if enhanced headers were actually used
-    if "Enhanced headers requested but not available" in output:
-        result['header_detector_available'] = False
-        result['enhanced_headers_used'] = False
-    elif enhanced and "🤖 Enhanced business headers detected" in output:
-        result['enhanced_headers_used'] = True
-    elif enhanced:
-        result['enhanced_headers_used'] = False
-    
-    # Parse summary statistics
-    for line in lines:
-        if "Fillable columns:" in line:
-            try:
-                result['fillable_columns'] = int(line.split(":")[1].strip())
-            except:
-                pass
-        elif "Unknown columns:" in line:
-            try:
-                result['unknown_columns'] = int(line.split(":")[1].strip())
-            except:
-                pass
-        elif "Sheets processed:" in line:
-            try:
-                result['sheets_processed'] = int(line.split(":")[1].strip())
-            except:
-                pass
-    
-    result['total_columns'] = result['fillable_columns'] + result['unknown_columns']
-    
-    return result
 
 def test_file_pair(file_path):
     """Test a single file with both enhanced and basic headers"""
-    print(f"🔍 Testing: {file_path.name}")
+    # One after the other: both passes share STORE and the detector's pending decisions,
+    # so files run in parallel across worker processes instead
+    enhanced_result = run_identification(file_path, True)
+    basic_result = run_identification(file_path, False)
     
-    # Test with enhanced headers
-    enhanced_result = run_identification(file_path, enhanced=True)
-    
-    # Test with basic headers  
-    basic_result = run_identification(file_path, enhanced=False)
+    return build_comparison(file_path, enhanced_result, basic_result)
+
+def _test_file_pair_worker(file_path):
+    """test_file_pair in a worker process, also returning the OpenAI decisions it made.
     
+    Workers queue decisions instead of writing the shared history file (see
+    defer_decision_history); the parent saves them all at once."""
+    return test_file_pair(file_path), take_pending_decisions()
+
+def build_comparison(file_path, enhanced_result, basic_result):
+    """Combine the enhanced and basic results for a file, or None if either failed"""
     if enhanced_result and basic_result:
-        comparison = {
+        return {
             'file_name': file_path.name,
             'enhanced': enhanced_result,
             'basic': basic_result,
@@ -106,25 +103,30 @@ def test_file_pair(file_path):
                 'accuracy_improvement': 0  # Will calculate if we have ground truth
             }
         }
-        
-        # Print summary
-        enhanced_icon = "🤖" if enhanced_result.get('enhanced_headers_used') else "📊"
-        basic_icon = "📊"
-        
-        print(f"  {enhanced_icon} Enhanced: {enhanced_result['fillable_columns']} fillable columns")
-        print(f"  {basic_icon} Basic: {basic_result['fillable_columns']} fillable columns")
-        
-        if enhanced_result['fillable_columns'] > basic_result['fillable_columns']:
-            print(f"  ✅ +{comparison['improvement']['fillable_columns_delta']} improvement with enhanced headers")
-        elif enhanced_result['fillable_columns'] < basic_result['fillable_columns']:
-            print(f"  ⚠️ {comparison['improvement']['fillable_columns_delta']} fewer columns with enhanced headers")
-        else:
-            print(f"  ➖ No difference in fillable columns")
-        
-        return comparison
     
     return None
 
+def print_comparison(file_path, comparison):
+    """Print the enhanced vs basic summary for one tested file"""
+    print(f"🔍 Testing: {file_path.name}")
+    if not comparison:
+        return
+    
+    enhanced_result = comparison['enhanced']
+    basic_result = comparison['basic']
+    enhanced_icon = "🤖" if enhanced_result.get('enhanced_headers_used') else "📊"
+    basic_icon = "📊"
+    
+    print(f"  {enhanced_icon} Enhanced: {enhanced_result['fillable_columns']} fillable columns")
+    print(f"  {basic_icon} Basic: {basic_result['fillable_columns']} fillable columns")
+    
+    if enhanced_result['fillable_columns'] > basic_result['fillable_columns']:
+        print(f"  ✅ +{comparison['improvement']['fillable_columns_delta']} improvement with enhanced headers")
+    elif enhanced_result['fillable_columns'] < basic_result['fillable_columns']:
+        print(f"  ⚠️ {comparison['improvement']['fillable_columns_delta']} fewer columns with enhanced headers")
+    else:
+        print(f"  ➖ No difference in fillable columns")
+
 def generate_detailed_report(test_results):
     """Generate a comprehensive test report"""
     
@@ -132,47 +134,66 @@ def generate_detailed_report(test_results):
         print("❌ No test results to report")
         return
     
-    print("\n" + "="*80)
-    print("🎯 COMPREHENSIVE TEST RESULTS - Enhanced vs Basic Headers")
-    print("="*80)
+    # Build the report and write it once rather than taking the stdout lock per line
+    lines = []
+    lines.append("\n" + "="*80)
+    lines.append("🎯 COMPREHENSIVE TEST RESULTS - Enhanced vs Basic Headers")
+    lines.append("="*80)
     
-    # Overall Statistics
+    # Overall Statistics, gathered in a single pass over the results
     total_files = len(test_results)
-    enhanced_better = sum(1 for r in test_results if r['improvement']['fillable_columns_delta'] > 0)
-    basic_better = sum(1 for r in test_results if r['improvement']['fillable_columns_delta'] < 0)
-    same_performance = sum(1 for r in test_results if r['improvement']['fillable_columns_delta'] == 0)
+    enhanced_better = basic_better = same_performance = 0
+    enhanced_available = enhanced_used = 0
+    enhanced_totals = basic_totals = 0
+    improvement_when_used = 0
     
-    enhanced_available = sum(1 for r in test_results if r['enhanced'].get('header_detector_available', False))
-    enhanced_used = sum(1 for r in test_results if r['enhanced'].get('enhanced_headers_used', False))
+    for r in test_results:
+        delta = r['improvement']['fillable_columns_delta']
+        if delta > 0:
+            enhanced_better += 1
+        elif delta < 0:
+            basic_better += 1
+        else:
+            same_performance += 1
+        
+        enhanced = r['enhanced']
+        if enhanced.get('header_detector_available', False):
+            enhanced_available += 1
+        if enhanced.get('enhanced_headers_used', False):
+            enhanced_used += 1
+            improvement_when_used += delta
+        
+        enhanced_totals += enhanced['fillable_columns']
+        basic_totals += r['basic']['fillable_columns']
     
-    print(f"📊 OVERALL STATISTICS:")
-    print(f"   • Total Files Tested: {total_files}")
-    print(f"   • Enhanced Headers Available: {enhanced_available}/{total_files} ({enhanced_available/total_files*100:.1f}%)")
-    print(f"   • Enhanced Headers Actually Used: {enhanced_used}/{total_files} ({enhanced_used/total_files*100:.1f}%)")
-    print(f"   • Enhanced Performed Better: {enhanced_better}/{total_files} ({enhanced_better/total_files*100:.1f}%)")
-    print(f"   • Basic Performed Better: {basic_better}/{total_files} ({basic_better/total_files*100:.1f}%)")
-    print(f"   • Same Performance: {same_performance}/{total_files} ({same_performance/total_files*100:.1f}%)")
+    lines.append(f"📊 OVERALL STATISTICS:")
+    lines.append(f"   • Total Files Tested: {total_files}")
+    lines.append(f"   • Enhanced Headers Available: {enhanced_available}/{total_files} ({enhanced_available/total_files*100:.1f}%)")
+    lines.append(f"   • Enhanced Headers Actually Used: {enhanced_used}/{total_files} ({enhanced_used/total_files*100:.1f}%)")
+    lines.append(f"   • Enhanced Performed Better: {enhanced_better}/{total_files} ({enhanced_better/total_files*100:.1f}%)")
+    lines.append(f"   • Basic Performed Better: {basic_better}/{total_files} ({basic_better/total_files*100:.1f}%)")
+    lines.append(f"   • Same Performance: {same_performance}/{total_files} ({same_performance/total_files*100:.1f}%)")
     
     # Performance Metrics
-    enhanced_totals = sum(r['enhanced']['fillable_columns'] for r in test_results)
-    basic_totals = sum(r['basic']['fillable_columns'] for r in test_results)
     total_improvement = enhanced_totals - basic_totals
     
-    print(f"\\n📈 PERFORMANCE METRICS:")
-    print(f"   • Total Enhanced Fillable Columns: {enhanced_totals}")
-    print(f"   • Total Basic Fillable Columns: {basic_totals}")
-    print(f"   • Net Improvement: {total_improvement} columns ({total_improvement/basic_totals*100:.1f}%)")
+    lines.append(f"\\n📈 PERFORMANCE METRICS:")
+    lines.append(f"   • Total Enhanced Fillable Columns: {enhanced_totals}")
+    lines.append(f"   • Total Basic Fillable Columns: {basic_totals}")
+    lines.append(f"   • Net Improvement: {total_improvement} columns ({total_improvement/basic_totals*100:.1f}%)")
     
     # Individual File Results
-    print(f"\\n📋 DETAILED FILE RESULTS:")
-    print(f"{'File Name':<50} {'Enhanced':<10} {'Basic':<10} {'Delta':<8} {'Status':<15}")
-    print("-" * 95)
-    
-    for result in sorted(test_results, key=lambda x: x['improvement']['fillable_columns_delta'], reverse=True):
-        enhanced_cols = result['enhanced']['fillable_columns']
-        basic_cols = result['basic']['fillable_columns']
-        delta = result['improvement']['fillable_columns_delta']
-        
+    lines.append(f"\\n📋 DETAILED FILE RESULTS:")
+    lines.append(f"{'File Name':<50} {'Enhanced':<10} {'Basic':<10} {'Delta':<8} {'Status':<15}")
+    lines.append("-" * 95)
+    
+    # Flatten each result once, then sort on the delta with a C-level key
+    rows = [(r['improvement']['fillable_columns_delta'], r['enhanced'].get('enhanced_headers_used', False),
+             r['file_name'], r['enhanced']['fillable_columns'], r['basic']['fillable_columns'])
+            for r in test_results]
+    rows.sort(key=itemgetter(0), reverse=True)
+    
+    for delta, used, name, enhanced_cols, basic_cols in rows:
         if delta > 0:
             status = f"✅ +{delta}"
         elif delta < 0:
@@ -180,39 +201,48 @@ def generate_detailed_report(test_results):
         else:
             status = "➖ Same"
         
-        enhanced_icon = "🤖" if result['enhanced'].get('enhanced_headers_used') else "📊"
-        file_name = result['file_name'][:45] + "..." if len(result['file_name']) > 45 else result['file_name']
+        enhanced_icon = "🤖" if used else "📊"
+        file_name = name[:45] + "..." if len(name) > 45 else name
         
-        print(f"{file_name:<50} {enhanced_icon}{enhanced_cols:<9} 📊{basic_cols:<9} {delta:<8} {status:<15}")
+        lines.append(f"{file_name:<50} {enhanced_icon}{enhanced_cols:<9} 📊{basic_cols:<9} {delta:<8} {status:<15}")
     
     # Success Rate Analysis
     if enhanced_available > 0:
         actual_enhancement_rate = enhanced_used / enhanced_available * 100
-        print(f"\\n🎯 ENHANCEMENT SUCCESS ANALYSIS:")
-        print(f"   • When Enhanced Headers Available: {actual_enhancement_rate:.1f}% actually used")
-        print(f"   • Average Improvement When Enhanced Used: {statistics.mean([r['improvement']['fillable_columns_delta'] for r in test_results if r['enhanced'].get('enhanced_headers_used', False)]):.1f} columns")
+        avg_improvement_when_used = improvement_when_used / enhanced_used if enhanced_used else 0
+        lines.append(f"\\n🎯 ENHANCEMENT SUCCESS ANALYSIS:")
+        lines.append(f"   • When Enhanced Headers Available: {actual_enhancement_rate:.1f}% actually used")
+        lines.append(f"   • Average Improvement When Enhanced Used: {avg_improvement_when_used:.1f} columns")
+    
+    sys.stdout.write("\n".join(lines) + "\n")
     
     # Generate CSV Report
     csv_path = Path("test_results_report.csv")
-    with open(csv_path, 'w', newline='') as csvfile:
+    with open(csv_path, 'w', newline='', buffering=1 << 20) as csvfile:
         fieldnames = ['file_name', 'enhanced_fillable', 'basic_fillable', 'improvement', 
                      'enhanced_headers_used', 'enhanced_headers_available']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer = csv.writer(csvfile)
         
-        writer.writeheader()
-        for result in test_results:
-            writer.writerow({
-                'file_name': result['file_name'],
-                'enhanced_fillable': result['enhanced']['fillable_columns'],
-                'basic_fillable': result['basic']['fillable_columns'],
-                'improvement': result['improvement']['fillable_columns_delta'],
-                'enhanced_headers_used': result['enhanced'].get('enhanced_headers_used', False),
-                'enhanced_headers_available': result['enhanced'].get('header_detector_available', False)
-            })
+        writer.writerow(fieldnames)
+        writer.writerows(
+            (result['file_name'],
+             result['enhanced']['fillable_columns'],
+             result['basic']['fillable_columns'],
+             result['improvement']['fillable_columns_delta'],
+             result['enhanced'].get('enhanced_headers_used', False),
+             result['enhanced'].get('header_detector_available', False))
+            for result in test_results
+        )
     
     print(f"\\n💾 Detailed CSV report saved to: {csv_path}")
 
 def main():
+    parser = argparse.ArgumentParser(description="Compare enhanced and basic header identification on the test set")
+    parser.add_argument("--no-cache", action="store_true", help="Re-run identification for every file")
+    args = parser.parse_args()
+    
+    # Resolve relative paths (test set, decision history) as the CLI would
+    os.chdir(PROJECT_DIR)
     test_dir = Path("test_set")
     
     if not test_dir.exists():
@@ -220,7 +250,9 @@ def main():
         return
     
     # Get all structured JSON files in test set
-    test_files = list(test_dir.glob("*_structured.json"))
+    with os.scandir(test_dir) as entries:
+        test_files = sorted(Path(e.path) for e in entries
+                            if e.name.endswith("_structured.json") and e.is_file(follow_symlinks=False))
     
     if not test_files:
         print(f"❌ No test files found in {test_dir}")
@@ -231,13 +263,47 @@ def main():
     print(f"🎯 Testing enhanced header detection vs basic headers")
     print("="*60)
     
-    test_results = []
-    
-    for i, test_file in enumerate(test_files, 1):
-        print(f"\\n[{i}/{len(test_files)}] ", end="")
-        result = test_file_pair(test_file)
-        if result:
-            test_results.append(result)
+    # Results keyed by test file, reported in test-file order whatever order they finish in
+    results = {}
+    
+    # Only this process touches the cache, so workers never write to the shelf concurrently
+    cache = {} if args.no_cache else shelve.open(CACHE_PATH)
+    if not args.no_cache:
+        atexit.register(cache.close)
+    
+    # Reuse results for files unchanged since a previous run
+    pending = []
+    i = 0
+    for test_file in test_files:
+        enhanced_key, basic_key = cache_key(test_file, True), cache_key(test_file, False)
+        if enhanced_key in cache and basic_key in cache:
+            i += 1
+            result = build_comparison(test_file, cache[enhanced_key], cache[basic_key])
+            print(f"\\n[{i}/{len(test_files)}] ", end="")
+            print_comparison(test_file, result)
+            results[test_file] = result
+        else:
+            pending.append(test_file)
+    
+    # Files are independent; leave one core for this process, which does all the printing
+    decisions = {}
+    with ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 1) - 1),
+                             initializer=defer_decision_history) as executor:
+        futures = {executor.submit(_test_file_pair_worker, test_file): test_file for test_file in pending}
+        for future in as_completed(futures):
+            i += 1
+            test_file = futures[future]
+            result, decisions[test_file] = future.result()
+            print(f"\\n[{i}/{len(test_files)}] ", end="")
+            print_comparison(test_file, result)
+            if result:
+                results[test_file] = result
+                cache[cache_key(test_file, True)] = result['enhanced']
+                cache[cache_key(test_file, False)] = result['basic']
+    
+    # Single writer: add the workers' decisions to the history file in test-file order
+    merge_decision_history([d for test_file in pending for d in decisions[test_file]])
+    test_results = [results[test_file] for test_file in test_files if results.get(test_file)]
     
     print("\\n" + "="*60)
     print("🎉 Testing completed!")
@@ -247,8 +313,8 @@ def main():
     
     # Save detailed results
     results_path = Path("detailed_test_results.json")
-    with open(results_path, 'w') as f:
-        json.dump(test_results, f, indent=2)
+    with open(results_path, 'wb') as f:
+        f.write(dump_json(test_results))
     
     print(f"\\n💾 Detailed test results saved to: {results_path}")
 
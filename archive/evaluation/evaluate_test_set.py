@@ -1,90 +1,81 @@
 #!/usr/bin/env python3
 
-import json
+import heapq
 import os
-import subprocess
 import sys
 from pathlib import Path
-from typing import Dict, List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+from typing import Dict, List, Optional, Tuple
 
-def run_identify(file_path: str, sheet_name: str = None) -> Dict:
-    """Run the identify command and parse results."""
-    cmd = [
-        sys.executable, "-m", "filing_assistant.cli", "identify",
-        "--file", file_path,
-        "--store", "patterns_store.json",
-        "--enhanced-headers"
-    ]
-    
-    if sheet_name:
-        cmd.extend(["--sheet", sheet_name])
-    
-    try:
-        result = subprocess.run(cmd, capture_output=True, text=True, cwd="/home/ubuntu/MyProject/filling_assistant")
-        return {
-            "success": result.returncode == 0,
-            "stdout": result.stdout,
-            "stderr": result.stderr,
-            "returncode": result.returncode
-        }
-    except Exception as e:
-        return {
-            "success": False,
-            "error": str(e),
-            "stdout": "",
-            "stderr": ""
-        }
+PROJECT_DIR = "/home/ubuntu/MyProject/filling_assistant"
+sys.path.insert(0, PROJECT_DIR)
+
+from filing_assistant.enhanced_header_detector import take_pending_decisions, merge_decision_history
+from filing_assistant.store import dump_json, loads_json
+from identify_worker import init_worker, run_identify
+
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    ijson = None
+    IJSON_AVAILABLE = False
 
 def get_sheet_names(file_path: str) -> List[str]:
     """Extract sheet names from structured JSON file."""
     try:
-        with open(file_path, 'r') as f:
-            data = json.load(f)
+        with open(file_path, 'rb') as f:
+            if IJSON_AVAILABLE:
+                # Collect only top-level keys; sheet contents are tokenized but never built
+                return [value for prefix, event, value in ijson.parse(f) if prefix == '' and event == 'map_key']
+            data = loads_json(f.read())
         return list(data.keys())
     except Exception as e:
         print(f"Error reading {file_path}: {e}")
         return []
 
-def parse_identification_results(output: str) -> Dict:
-    """Parse the identification output to extract metrics."""
-    fillable_columns = 0
-    unknown_columns = 0
-    sheets_processed = 0
-    enhanced_enabled = False
-    
-    lines = output.split('\n')
-    for line in lines:
-        if "Fillable columns:" in line:
-            try:
-                fillable_columns = int(line.split("Fillable columns:")[1].split()[0])
-            except:
-                pass
-        elif "Unknown columns:" in line:
-            try:
-                unknown_columns = int(line.split("Unknown columns:")[1].split()[0])
-            except:
-                pass
-        elif "Sheets processed:" in line:
-            try:
-                sheets_processed = int(line.split("Sheets processed:")[1].split()[0])
-            except:
-                pass
-        elif "Enhanced headers: ENABLED" in line:
-            enhanced_enabled = True
+def _evaluate_file_worker(file_path: Path) -> Tuple[Optional[Dict], List]:
+    """evaluate_file in a worker process, also returning the decisions it made."""
+    return evaluate_file(file_path), take_pending_decisions()
+
+def evaluate_file(file_path: Path) -> Optional[Dict]:
+    """Identify every sheet of one file; returns None when its sheets cannot be read."""
+    sheet_names = get_sheet_names(str(file_path))
+    if not sheet_names:
+        return None
     
-    return {
-        "fillable_columns": fillable_columns,
-        "unknown_columns": unknown_columns,
-        "sheets_processed": sheets_processed,
-        "enhanced_enabled": enhanced_enabled,
-        "total_columns": fillable_columns + unknown_columns
+    file_results = {
+        "file": file_path.name,
+        "sheets": {},
+        "total_fillable": 0,
+        "total_unknown": 0,
+        "total_columns": 0
     }
+    
+    # Test each sheet
+    for sheet_name in sheet_names:
+        metrics = run_identify(str(file_path), sheet_name)
+        
+        if metrics["success"]:
+            file_results["sheets"][sheet_name] = metrics
+            file_results["total_fillable"] += metrics["fillable_columns"]
+            file_results["total_unknown"] += metrics["unknown_columns"]
+            file_results["total_columns"] += metrics["total_columns"]
+        else:
+            file_results["sheets"][sheet_name] = {"error": metrics.get("error", "Unknown error")}
+    
+    return file_results
 
 def main():
-    test_dir = Path("/home/ubuntu/MyProject/filling_assistant/test_subset")
+    # Resolve relative paths (decision history, patterns store) as the CLI would
+    os.chdir(PROJECT_DIR)
+    test_dir = Path(PROJECT_DIR) / "test_subset"
     
     # Find all empty files
-    empty_files = [f for f in test_dir.glob("*Empty*structured.json")]
+    with os.scandir(test_dir) as entries:
+        empty_files = [Path(e.path) for e in entries
+                       if "Empty" in e.name and e.name.endswith("structured.json") and e.is_file(follow_symlinks=False)]
     
     print(f"🧪 Testing Enhanced Header Detection on {len(empty_files)} files")
     print("=" * 80)
@@ -94,51 +85,41 @@ def main():
     total_unknown = 0
     total_columns = 0
     successful_tests = 0
+    decisions = []
     
-    for file_path in empty_files:
-        print(f"\n📁 Testing: {file_path.name}")
-        
-        # Get sheet names
-        sheet_names = get_sheet_names(str(file_path))
-        if not sheet_names:
-            print(f"   ❌ Could not read sheet names")
-            continue
+    # Files are independent; leave one core for this process, which does all the printing
+    with ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 1) - 1), initializer=init_worker,
+                             initargs=("patterns_store.json",)) as executor:
+        for file_path, (file_results, file_decisions) in zip(empty_files, executor.map(_evaluate_file_worker, empty_files)):
+            decisions.extend(file_decisions)
+            # Write each file's report in one call instead of several prints per sheet
+            lines = [f"\n📁 Testing: {file_path.name}"]
             
-        file_results = {
-            "file": file_path.name,
-            "sheets": {},
-            "total_fillable": 0,
-            "total_unknown": 0,
-            "total_columns": 0
-        }
-        
-        # Test each sheet
-        for sheet_name in sheet_names:
-            print(f"   📋 Sheet: {sheet_name}")
+            if file_results is None:
+                lines.append(f"   ❌ Could not read sheet names")
+                sys.stdout.write("\n".join(lines) + "\n")
+                continue
             
-            result = run_identify(str(file_path), sheet_name)
+            for sheet_name, metrics in file_results["sheets"].items():
+                lines.append(f"   📋 Sheet: {sheet_name}")
+                if "error" in metrics:
+                    lines.append(f"      ❌ Failed: {metrics['error']}")
+                else:
+                    lines.append(f"      ✅ {metrics['fillable_columns']} fillable, {metrics['unknown_columns']} unknown")
             
-            if result["success"]:
-                metrics = parse_identification_results(result["stdout"])
-                file_results["sheets"][sheet_name] = metrics
-                file_results["total_fillable"] += metrics["fillable_columns"]
-                file_results["total_unknown"] += metrics["unknown_columns"]
-                file_results["total_columns"] += metrics["total_columns"]
+            if file_results["total_columns"] > 0:
+                successful_tests += 1
+                total_fillable += file_results["total_fillable"]
+                total_unknown += file_results["total_unknown"]
+                total_columns += file_results["total_columns"]
                 
-                print(f"      ✅ {metrics['fillable_columns']} fillable, {metrics['unknown_columns']} unknown")
-            else:
-                print(f"      ❌ Failed: {result.get('error', 'Unknown error')}")
-                file_results["sheets"][sheet_name] = {"error": result.get("error", "Unknown error")}
-        
-        if file_results["total_columns"] > 0:
-            successful_tests += 1
-            total_fillable += file_results["total_fillable"]
-            total_unknown += file_results["total_unknown"]
-            total_columns += file_results["total_columns"]
+                lines.append(f"   📊 File Total: {file_results['total_fillable']} fillable / {file_results['total_columns']} columns")
             
-            print(f"   📊 File Total: {file_results['total_fillable']} fillable / {file_results['total_columns']} columns")
-        
-        results.append(file_results)
+            sys.stdout.write("\n".join(lines) + "\n")
+            results.append(file_results)
+    
+    # Single writer: the workers' decisions are added to the history file in one save
+    merge_decision_history(decisions)
     
     # Summary
     print("\n" + "=" * 80)
@@ -156,16 +137,16 @@ def main():
     # Top performing files
     print(f"\n📈 TOP PERFORMING FILES:")
     performing_files = [r for r in results if r["total_columns"] > 0]
-    performing_files.sort(key=lambda x: x["total_fillable"], reverse=True)
+    top_files = heapq.nlargest(5, performing_files, key=itemgetter("total_fillable"))
     
-    for i, file_result in enumerate(performing_files[:5]):
+    for i, file_result in enumerate(top_files):
         if file_result["total_columns"] > 0:
             rate = (file_result["total_fillable"] / file_result["total_columns"]) * 100
             print(f"   {i+1}. {file_result['file']}: {file_result['total_fillable']}/{file_result['total_columns']} ({rate:.1f}%)")
     
     # Save detailed results
-    with open("/home/ubuntu/MyProject/filling_assistant/test_evaluation_results.json", "w") as f:
-        json.dump({
+    with open("/home/ubuntu/MyProject/filling_assistant/test_evaluation_results.json", "wb") as f:
+        f.write(dump_json({
             "summary": {
                 "files_tested": successful_tests,
                 "total_files": len(empty_files),
@@ -175,7 +156,7 @@ def main():
                 "fillable_rate": (total_fillable / total_columns * 100) if total_columns > 0 else 0
             },
             "detailed_results": results
-        }, f, indent=2)
+        }))
     
     print(f"\n📝 Detailed results saved to: test_evaluation_results.json")
 
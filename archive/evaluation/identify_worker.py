@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+In-process identification shared by the evaluation scripts' worker pools.
+
+Import it after the script has put the project directory on sys.path, and pass
+init_worker as the ProcessPoolExecutor initializer.
+"""
+
+from typing import Dict
+
+from filing_assistant.cli import identify_file
+from filing_assistant.enhanced_header_detector import defer_decision_history
+from filing_assistant.store import load_store
+
+# Pattern store loaded once per worker process by init_worker
+_WORKER_STORE: Dict = {}
+
+def init_worker(store_path: str):
+    """Load the pattern store once in each worker process.
+
+    Workers queue their OpenAI decisions instead of writing the shared history file;
+    the parent saves them all at once."""
+    global _WORKER_STORE
+    _WORKER_STORE = load_store(store_path)
+    defer_decision_history()
+
+def run_identify(file_path: str, sheet_name: str = None) -> Dict:
+    """Run identification against the worker's store and return the summary metrics."""
+    try:
+        result = identify_file(file_path, _WORKER_STORE, enhanced_headers=True, sheet=sheet_name)
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+    if "error" in result:
+        return {
+            "success": False,
+            "error": result["error"]
+        }
+
+    summary = result.get("summary", {})
+    fillable_columns = summary.get("total_fillable_columns", 0)
+    unknown_columns = summary.get("total_unknown_columns", 0)
+    return {
+        "success": True,
+        "fillable_columns": fillable_columns,
+        "unknown_columns": unknown_columns,
+        "sheets_processed": summary.get("sheets_processed", 0),
+        "enhanced_enabled": bool(summary.get("enhanced_headers_used") or summary.get("enhancement_used")),
+        "total_columns": fillable_columns + unknown_columns
+    }
@@ -6,11 +6,265 @@ This implements the full system with 5 detection strategies including OpenAI val
 and generates comprehensive header mappings for the filing assistant system.
 """
 
-import json
 import os
+import re
+import sys
 from pathlib import Path
-from typing import Dict, Any, List
-from enhanced_header_detector import EnhancedHeaderDetector
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+import repo_root  # noqa: F401  (puts the repository root on sys.path)
+from filing_assistant.store import dump_json, loads_json
+from header_detector import IJSON_AVAILABLE, STREAM_THRESHOLD_BYTES, _col_keys, load_cached_json, stream_sheets
+
+def write_atomic(path: Path, payload: bytes) -> None:
+    """Write via a temp file and rename so an interrupted run never leaves a truncated file."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    try:
+        tmp_path.write_bytes(payload)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+def sidecar_paths(output_path: Path) -> Tuple[Path, Path]:
+    """
+    Return (jsonl_path, meta_path) for a mappings file.
+    
+    The JSONL sidecar holds one {file_name: file_mapping} line per training file; the
+    meta file holds the run metadata and each file's byte offset in the JSONL. While a
+    run is in progress the JSONL is appended to under a ".partial" name.
+    """
+    return output_path.with_suffix(".jsonl"), output_path.with_name(output_path.stem + ".meta.json")
+
+def counters_from_mapping(file_mapping: Dict[str, Any]) -> Dict[str, Any]:
+    """Rebuild the run-statistics counters of a finished file from its mapping."""
+    file_stats = file_mapping["file_statistics"]
+    sheets = file_mapping["sheets"].values()
+    return {
+        "generic_sheets": file_stats["generic_sheets"],
+        "strategy_hits": Counter(
+            f"{strategy}_hits" for sheet in sheets
+            for strategy, count in sheet["strategies_used"].items() if count > 0
+        ),
+        "openai_validations": file_stats["openai_validations"],
+        "headers_detected": file_stats["total_headers_detected"],
+        "confidence_sum": sum(sheet["confidence"] for sheet in sheets)
+    }
+
+def read_partial_mappings(partial_path: Path) -> Tuple[Dict[str, Tuple[Dict[str, Any], bool, Dict[str, Any], int]], int]:
+    """
+    Read the entries an interrupted run already appended to its partial JSONL file.
+    
+    Returns ({file_name: (counters, has_generic_headers, file_statistics, byte offset)},
+    length of the complete lines); the sheet mappings themselves are not kept. A
+    truncated last line ends the read.
+    """
+    entries = {}
+    length = 0
+    try:
+        f = open(partial_path, 'rb')
+    except OSError:
+        return entries, length
+    with f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                (file_name, file_mapping), = loads_json(line).items()
+                counters = counters_from_mapping(file_mapping)
+            except (ValueError, KeyError):
+                break
+            entries[file_name] = (counters, file_mapping["has_generic_headers"],
+                                  file_mapping["file_statistics"], length)
+            length += len(line)
+    return entries, length
+
+def load_enhanced_header_mappings(training_dir: str = "training_files2",
+                                  file_name: Optional[str] = None,
+                                  output_file: str = "enhanced_header_mappings.json") -> Dict[str, Any]:
+    """
+    Load all enhanced header mappings, or only the mapping for `file_name`.
+    
+    Single-file lookups seek straight to the file's line in the JSONL sidecar instead of
+    parsing every mapping. Returns {} when nothing is found.
+    """
+    output_path = Path(training_dir) / output_file
+    jsonl_path, meta_path = sidecar_paths(output_path)
+    
+    try:
+        if file_name is not None and meta_path.exists() and jsonl_path.exists():
+            offset = loads_json(meta_path.read_bytes())["offsets"].get(file_name)
+            if offset is None:
+                return {}
+            with open(jsonl_path, 'rb') as f:
+                f.seek(offset)
+                return loads_json(f.readline())[file_name]
+        
+        if not output_path.exists():
+            print(f"⚠️  Enhanced mapping file not found: {output_path}")
+            return {}
+        
+        mappings = loads_json(output_path.read_bytes())
+    except Exception as e:
+        print(f"❌ Error loading enhanced mappings: {e}")
+        return {}
+    
+    if file_name is not None:
+        return mappings.get("file_mappings", {}).get(file_name, {})
+    return mappings
+
+# 2.0 stores detected_headers as a positional list instead of a {col_N: header} dict
+MAPPINGS_VERSION = "2.0"
+
+# Matches generic column names like col_0, col_12
+_is_generic_column = re.compile(r'col_\d+').fullmatch
+
+# The detector only scans the first 50 rows of a sheet
+MAX_SEARCH_ROWS = 50
+
+def load_training_file(json_file: Path) -> Dict[str, Any]:
+    """
+    Load a *_structured.json training file.
+    
+    Large files are streamed with ijson when it is installed, building only the rows the
+    detector scans, so rows past those are never held in memory.
+    """
+    if not IJSON_AVAILABLE or json_file.stat().st_size < STREAM_THRESHOLD_BYTES:
+        return load_cached_json(json_file)
+    return stream_sheets(json_file, MAX_SEARCH_ROWS)
+
+# Detector used by _process_one_file: set per worker process by _init_worker,
+# or shared across threads when OpenAI validation is enabled
+_DETECTOR = None
+
+def _init_worker(openai_api_key: str = None) -> None:
+    """Create the detector once in each worker process."""
+    from filing_assistant.enhanced_header_detector import EnhancedHeaderDetector
+    global _DETECTOR
+    _DETECTOR = EnhancedHeaderDetector(openai_api_key)
+
+def _process_one_file(json_file: Path) -> Tuple[str, Optional[Dict[str, Any]], Dict[str, Any], str]:
+    """
+    Run enhanced detection on every generic-header sheet of one training file.
+    
+    Returns:
+        Tuple of (file_name, file_mapping or None if the file failed, counters to add
+        to the run metadata, buffered progress output for the file)
+    """
+    file_name = json_file.name
+    # Progress lines are collected and written once per file by the parent
+    log = []
+    put = log.append
+    put(f"\n📁 {file_name}")
+    
+    counters = {
+        "generic_sheets": 0,
+        "strategy_hits": Counter(),
+        "openai_validations": 0,
+        "headers_detected": 0,
+        "confidence_sum": 0.0
+    }
+    
+    try:
+        data = load_training_file(json_file)
+        
+        file_mapping = {
+            "file_path": str(json_file),
+            "has_generic_headers": False,
+            "sheets": {},
+            "file_statistics": {
+                "total_sheets": len(data),
+                "generic_sheets": 0,
+                "openai_validations": 0,
+                "sheets_with_detection": 0,
+                "total_headers_detected": 0,
+                "avg_confidence": 0.0
+            }
+        }
+        
+        # Only sheets with generic headers need detection
+        generic_sheets = {}
+        sheet_order = []
+        for sheet_name, sheet_data in data.items():
+            if not isinstance(sheet_data, dict) or 'columns' not in sheet_data:
+                continue
+            
+            sheet_order.append(sheet_name)
+            if any(map(_is_generic_column, sheet_data['columns'])):
+                generic_sheets[sheet_name] = sheet_data
+        
+        # Validate all generic sheets of the file together (one OpenAI request per batch
+        # of sheets instead of one per sheet)
+        detection_results = (
+            _DETECTOR.detect_headers_enhanced_batch(generic_sheets, file_name) if generic_sheets else {}
+        )
+        
+        for sheet_name in sheet_order:
+            if sheet_name not in generic_sheets:
+                put(f"   📋 {sheet_name}: Good headers (no detection needed)")
+                continue
+            
+            file_mapping["has_generic_headers"] = True
+            counters["generic_sheets"] += 1
+            
+            detection_result = detection_results[sheet_name]
+            column_count = len(generic_sheets[sheet_name]['columns'])
+            
+            put(f"   📋 {sheet_name}: {column_count} columns (generic headers)")
+            
+            if detection_result["final_mapping"]:
+                file_mapping["sheets"][sheet_name] = {
+                    # Positional list, one entry per column; undetected columns keep their generic name
+                    "detected_headers": [
+                        detection_result["final_mapping"].get(key, key) for key in _col_keys(column_count)
+                    ],
+                    "confidence": detection_result["confidence"],
+                    "strategies_used": detection_result["strategy_results"],
+                    "candidates_found": len(detection_result["candidates"]),
+                    "openai_reasoning": detection_result["openai_validation"].get("reasoning", ""),
+                    "total_headers": len(detection_result["final_mapping"])
+                }
+                
+                file_mapping["file_statistics"]["sheets_with_detection"] += 1
+                file_mapping["file_statistics"]["total_headers_detected"] += len(detection_result["final_mapping"])
+                
+                counters["confidence_sum"] += detection_result["confidence"]
+                
+                # Update strategy statistics
+                for strategy, count in detection_result["strategy_results"].items():
+                    if count > 0:
+                        counters["strategy_hits"][f"{strategy}_hits"] += 1
+                
+                if detection_result["openai_validation"].get("confidence", 0) > 0:
+                    counters["openai_validations"] += 1
+                
+                counters["headers_detected"] += len(detection_result["final_mapping"])
+                
+                put(f"      ✅ {len(detection_result['final_mapping'])} headers detected (confidence: {detection_result['confidence']:.2f})")
+                
+                # Show sample headers
+                sample_headers = list(detection_result["final_mapping"].items())[:3]
+                for col, header in sample_headers:
+                    put(f"         {col} → '{header}'")
+                if len(detection_result["final_mapping"]) > 3:
+                    put(f"         ... and {len(detection_result['final_mapping']) - 3} more")
+            else:
+                put(f"      ❌ No headers detected")
+        
+        # Calculate file-level statistics from the running counters
+        file_stats = file_mapping["file_statistics"]
+        file_stats["generic_sheets"] = counters["generic_sheets"]
+        file_stats["openai_validations"] = counters["openai_validations"]
+        if file_stats["sheets_with_detection"]:
+            file_stats["avg_confidence"] = counters["confidence_sum"] / file_stats["sheets_with_detection"]
+        
+        return file_name, file_mapping, counters, "\n".join(log) + "\n"
+        
+    except Exception as e:
+        put(f"   ❌ Error processing file: {e}")
+        return file_name, None, counters, "\n".join(log) + "\n"
 
 def generate_enhanced_header_mappings(
     training_dir: str = "training_files2",
@@ -20,13 +274,17 @@ def generate_enhanced_header_mappings(
     """
     Generate enhanced header mappings using the 5-strategy detection system.
     
+    Files an interrupted run already finished are read back from its partial JSONL
+    file and not detected again.
+    
     Args:
         training_dir: Directory containing training JSON files
         output_file: Output file for enhanced header mappings
         openai_api_key: Optional OpenAI API key for validation
         
     Returns:
-        Dictionary containing comprehensive header mappings
+        The run metadata, the JSONL sidecar's name and each file's offset in it, as
+        written to the meta file
     """
     
     print("🚀 ENHANCED HEADER MAPPING GENERATION")
@@ -35,154 +293,171 @@ def generate_enhanced_header_mappings(
     print(f"🤖 OpenAI validation: {'Enabled' if openai_api_key else 'Disabled (using 4 strategies)'}")
     print()
     
+    # Imported here so the summary and guide helpers don't pay for the OpenAI client import
+    from filing_assistant.enhanced_header_detector import EnhancedHeaderDetector
+    
     # Initialize enhanced detector
     detector = EnhancedHeaderDetector(openai_api_key)
     
     training_path = Path(training_dir)
     json_files = list(training_path.glob("*_structured.json"))
     
-    enhanced_mappings = {
-        "metadata": {
-            "generated_by": "enhanced_header_mapping_system",
-            "version": "1.0",
-            "training_directory": training_dir,
-            "openai_enabled": bool(openai_api_key),
-            "total_files_processed": 0,
-            "files_with_generic_headers": 0,
-            "files_with_enhanced_detection": 0,
-            "strategy_statistics": {
-                "pattern_based_hits": 0,
-                "structural_hits": 0,
-                "template_pattern_hits": 0,
-                "historical_learning_hits": 0,
-                "openai_validations": 0
-            },
-            "quality_metrics": {
-                "avg_confidence": 0.0,
-                "high_confidence_files": 0,
-                "total_headers_detected": 0
-            }
+    metadata = {
+        "generated_by": "enhanced_header_mapping_system",
+        "version": MAPPINGS_VERSION,
+        "training_directory": training_dir,
+        "openai_enabled": bool(openai_api_key),
+        "total_files_processed": 0,
+        "files_with_generic_headers": 0,
+        "files_with_enhanced_detection": 0,
+        "strategy_statistics": {
+            "pattern_based_hits": 0,
+            "structural_hits": 0,
+            "template_pattern_hits": 0,
+            "historical_learning_hits": 0,
+            "openai_validations": 0
         },
-        "file_mappings": {}
+        "quality_metrics": {
+            "avg_confidence": 0.0,
+            "high_confidence_files": 0,
+            "total_headers_detected": 0
+        }
     }
     
     total_confidence = 0.0
+    # (file_name, avg_confidence, headers detected) of each file with generic headers, for the summary
+    file_performances = []
+    
+    output_path = Path(training_dir) / output_file
+    jsonl_path, meta_path = sidecar_paths(output_path)
+    partial_path = jsonl_path.with_name(jsonl_path.name + ".partial")
+    offsets = {}
+    
+    # Files an interrupted run already finished are taken from its partial JSONL file
+    resumed, resumed_length = read_partial_mappings(partial_path)
+    json_files = sorted(json_files)
+    to_process = [json_file for json_file in json_files if json_file.name not in resumed]
     
     print(f"🔍 Processing {len(json_files)} files...")
+    if resumed:
+        print(f"♻️  Resuming: {len(json_files) - len(to_process)} files already processed by an interrupted run")
     print("-" * 50)
     
-    for json_file in sorted(json_files):
-        file_name = json_file.name
-        print(f"\n📁 {file_name}")
-        
-        enhanced_mappings["metadata"]["total_files_processed"] += 1
+    # With OpenAI the work is network-bound and decisions must be recorded by one detector,
+    # so threads share it; otherwise each worker process gets its own detector
+    if detector.openai_client:
+        global _DETECTOR
+        _DETECTOR = detector
+        executor = ThreadPoolExecutor(max_workers=4)
+    else:
+        executor = ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=_init_worker,
+                                       initargs=(openai_api_key,))
+    
+    # Each file's mapping is appended to the partial JSONL as soon as it is ready, after
+    # dropping any truncated line an interrupted run left behind
+    with executor, open(partial_path, 'ab') as jsonl_file:
+        jsonl_file.truncate(resumed_length)
+        jsonl_file.seek(resumed_length)
+        # map() keeps results in file order so the output is deterministic
+        results = executor.map(_process_one_file, to_process)
         
-        try:
-            with open(json_file, 'r') as f:
-                data = json.load(f)
-            
-            file_mapping = {
-                "file_path": str(json_file),
-                "has_generic_headers": False,
-                "sheets": {},
-                "file_statistics": {
-                    "total_sheets": len(data),
-                    "sheets_with_detection": 0,
-                    "total_headers_detected": 0,
-                    "avg_confidence": 0.0
-                }
-            }
+        for json_file in json_files:
+            if json_file.name in resumed:
+                file_name = json_file.name
+                counters, has_generic_headers, file_stats, offset = resumed[file_name]
+                file_mapping = None
+            else:
+                file_name, file_mapping, counters, output = next(results)
+                sys.stdout.write(output)
+                if file_mapping is None:
+                    file_stats = None
+                else:
+                    has_generic_headers = file_mapping["has_generic_headers"]
+                    file_stats = file_mapping["file_statistics"]
+                offset = None
+            metadata["total_files_processed"] += 1
+            metadata["files_with_generic_headers"] += counters["generic_sheets"]
+            metadata["quality_metrics"]["total_headers_detected"] += counters["headers_detected"]
+            total_confidence += counters["confidence_sum"]
             
-            sheet_confidences = []
+            strategy_stats = metadata["strategy_statistics"]
+            for key, count in counters["strategy_hits"].items():
+                strategy_stats[key] += count
+            strategy_stats["openai_validations"] += counters["openai_validations"]
             
-            for sheet_name, sheet_data in data.items():
-                if not isinstance(sheet_data, dict) or 'columns' not in sheet_data:
-                    continue
-                
-                # Check if sheet has generic headers
-                columns = sheet_data['columns']
-                has_generic = any(col.startswith('col_') and col[4:].isdigit() for col in columns)
-                
-                if has_generic:
-                    file_mapping["has_generic_headers"] = True
-                    enhanced_mappings["metadata"]["files_with_generic_headers"] += 1
-                    
-                    print(f"   📋 {sheet_name}: {len(columns)} columns (generic headers)")
-                    
-                    # Run enhanced detection
-                    detection_result = detector.detect_headers_enhanced(sheet_data, file_name)
-                    
-                    if detection_result["final_mapping"]:
-                        file_mapping["sheets"][sheet_name] = {
-                            "detected_headers": detection_result["final_mapping"],
-                            "confidence": detection_result["confidence"],
-                            "strategies_used": detection_result["strategy_results"],
-                            "candidates_found": len(detection_result["candidates"]),
-                            "openai_reasoning": detection_result["openai_validation"].get("reasoning", ""),
-                            "total_headers": len(detection_result["final_mapping"])
-                        }
-                        
-                        file_mapping["file_statistics"]["sheets_with_detection"] += 1
-                        file_mapping["file_statistics"]["total_headers_detected"] += len(detection_result["final_mapping"])
-                        
-                        sheet_confidences.append(detection_result["confidence"])
-                        total_confidence += detection_result["confidence"]
-                        
-                        # Update strategy statistics
-                        strategy_stats = enhanced_mappings["metadata"]["strategy_statistics"]
-                        for strategy, count in detection_result["strategy_results"].items():
-                            if count > 0:
-                                strategy_stats[f"{strategy}_hits"] += 1
-                        
-                        if detection_result["openai_validation"].get("confidence", 0) > 0:
-                            strategy_stats["openai_validations"] += 1
-                        
-                        enhanced_mappings["metadata"]["quality_metrics"]["total_headers_detected"] += len(detection_result["final_mapping"])
-                        
-                        print(f"      ✅ {len(detection_result['final_mapping'])} headers detected (confidence: {detection_result['confidence']:.2f})")
-                        
-                        # Show sample headers
-                        sample_headers = list(detection_result["final_mapping"].items())[:3]
-                        for col, header in sample_headers:
-                            print(f"         {col} → '{header}'")
-                        if len(detection_result["final_mapping"]) > 3:
-                            print(f"         ... and {len(detection_result['final_mapping']) - 3} more")
-                    else:
-                        print(f"      ❌ No headers detected")
-                else:
-                    print(f"   📋 {sheet_name}: Good headers (no detection needed)")
+            if file_stats is None:
+                continue
             
             # Calculate file-level statistics
-            if sheet_confidences:
-                file_mapping["file_statistics"]["avg_confidence"] = sum(sheet_confidences) / len(sheet_confidences)
-                enhanced_mappings["metadata"]["files_with_enhanced_detection"] += 1
+            if file_stats["sheets_with_detection"]:
+                metadata["files_with_enhanced_detection"] += 1
                 
-                if file_mapping["file_statistics"]["avg_confidence"] > 0.7:
-                    enhanced_mappings["metadata"]["quality_metrics"]["high_confidence_files"] += 1
+                if file_stats["avg_confidence"] > 0.7:
+                    metadata["quality_metrics"]["high_confidence_files"] += 1
             
-            enhanced_mappings["file_mappings"][file_name] = file_mapping
+            if has_generic_headers:
+                file_performances.append(
+                    (file_name, file_stats["avg_confidence"], file_stats["total_headers_detected"])
+                )
             
-        except Exception as e:
-            print(f"   ❌ Error processing file: {e}")
+            # Mappings are not kept once written; the JSONL is their only copy until the end
+            if offset is None:
+                offset = jsonl_file.tell()
+                jsonl_file.write(dump_json({file_name: file_mapping}, indent=False) + b"\n")
+                jsonl_file.flush()
+            offsets[file_name] = offset
     
     # Calculate overall metrics
-    metadata = enhanced_mappings["metadata"]
     if metadata["files_with_enhanced_detection"] > 0:
         metadata["quality_metrics"]["avg_confidence"] = total_confidence / metadata["files_with_enhanced_detection"]
     
     # Save enhanced mappings
-    output_path = Path(training_dir) / output_file
-    with open(output_path, 'w') as f:
-        json.dump(enhanced_mappings, f, indent=2)
+    os.replace(partial_path, jsonl_path)
+    write_mappings_json(output_path, metadata, jsonl_path)
+    meta = {
+        "metadata": metadata,
+        "mappings_file": jsonl_path.name,
+        "offsets": offsets
+    }
+    write_atomic(meta_path, dump_json(meta))
     
-    print_enhanced_summary(enhanced_mappings)
+    print_enhanced_summary(metadata, file_performances)
     print(f"\n💾 Enhanced mappings saved to: {output_path}")
     
-    return enhanced_mappings
+    return meta
+
+def _indent(raw: bytes, width: int) -> bytes:
+    """Shift every line after the first of indented JSON right by `width` spaces."""
+    return raw.replace(b"\n", b"\n" + b" " * width)
+
+def write_mappings_json(output_path: Path, metadata: Dict[str, Any], jsonl_path: Path) -> None:
+    """
+    Write the combined {metadata, file_mappings} JSON from the JSONL sidecar.
+    
+    Mappings are copied one line at a time, so only one file's mapping is in memory;
+    the result is written to a temp file and renamed into place.
+    """
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    try:
+        with open(jsonl_path, 'rb') as f, open(tmp_path, 'wb') as out:
+            out.write(b'{\n  "metadata": ' + _indent(dump_json(metadata), 2) + b',\n  "file_mappings": {')
+            separator = b"\n    "
+            for line in f:
+                (file_name, file_mapping), = loads_json(line).items()
+                out.write(separator + dump_json(file_name) + b": " + _indent(dump_json(file_mapping), 4))
+                separator = b",\n    "
+            out.write(b"}\n}" if separator == b"\n    " else b"\n  }\n}")
+        os.replace(tmp_path, output_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
 
-def print_enhanced_summary(mappings: Dict[str, Any]) -> None:
-    """Print comprehensive summary of enhanced detection results."""
-    metadata = mappings["metadata"]
+def print_enhanced_summary(metadata: Dict[str, Any], file_performances: List[Tuple[str, float, int]]) -> None:
+    """Print comprehensive summary of enhanced detection results.
+    
+    file_performances holds (file_name, avg_confidence, headers detected) for each file
+    with generic headers.
+    """
     
     print(f"\n📊 ENHANCED DETECTION SUMMARY")
     print("=" * 35)
@@ -206,13 +481,6 @@ def print_enhanced_summary(mappings: Dict[str, Any]) -> None:
     print(f"   📋 Total headers detected: {quality['total_headers_detected']}")
     
     # Show top performing files
-    file_performances = []
-    for file_name, file_mapping in mappings["file_mappings"].items():
-        if file_mapping.get("has_generic_headers", False):
-            avg_conf = file_mapping["file_statistics"].get("avg_confidence", 0.0)
-            total_headers = file_mapping["file_statistics"].get("total_headers_detected", 0)
-            file_performances.append((file_name, avg_conf, total_headers))
-    
     if file_performances:
         file_performances.sort(key=lambda x: (x[1], x[2]), reverse=True)
         print(f"\n🏆 TOP PERFORMING FILES:")
@@ -241,10 +509,22 @@ def load_enhanced_header_mappings(training_dir: str = "training_files2") -> Dict
     
     try:
         with open(mapping_file, 'r') as f:
-            return json.load(f)
+            mappings = json.load(f)
     except Exception as e:
         print(f"❌ Error loading enhanced mappings: {e}")
         return {}
+    
+    # Migrate 1.0 files, which stored detected_headers as {col_N: header}
+    if mappings.get("metadata", {}).get("version") == "1.0":
+        for file_mapping in mappings.get("file_mappings", {}).values():
+            for sheet_mapping in file_mapping.get("sheets", {}).values():
+                headers = sheet_mapping.get("detected_headers", {})
+                if isinstance(headers, dict):
+                    sheet_mapping["detected_headers"] = [
+                        headers.get(f"col_{i}", f"col_{i}") for i in range(len(headers))
+                    ]
+    
+    return mappings
 
 def get_enhanced_headers(file_path: str, sheet_name: str) -> List[str]:
     \"\"\"Get enhanced headers using 5-strategy detection results.\"\"\"
@@ -260,21 +540,9 @@ def get_enhanced_headers(file_path: str, sheet_name: str) -> List[str]:
         return []  # File doesn't need enhancement
     
     sheet_mapping = file_mapping.get("sheets", {}).get(sheet_name, {})
-    detected_headers = sheet_mapping.get("detected_headers", {})
-    
-    if detected_headers:
-        # Sort by column index and return headers
-        sorted_headers = []
-        for i in range(len(detected_headers)):
-            col_key = f"col_{i}"
-            if col_key in detected_headers:
-                sorted_headers.append(detected_headers[col_key])
-            else:
-                sorted_headers.append(f"col_{i}")  # Fallback
-        
-        return sorted_headers
     
-    return []
+    # Already ordered by column index
+    return sheet_mapping.get("detected_headers", [])
 ```
 
 STEP 2: Update CLI for Better Display
@@ -6,11 +6,158 @@ This module provides multiple strategies to automatically identify real business
 buried in data rows when JSON files have generic column names like col_0, col_1, etc.
 """
 
-import json
+import hashlib
+import marshal
+import os
 import re
+from pathlib import Path
 from typing import Dict, List, Tuple, Optional, Any
 from collections import Counter
-import statistics
+from functools import lru_cache
+
+from repo_root import REPO_ROOT
+from filing_assistant.store import loads_json
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    ahocorasick = None
+    AHOCORASICK_AVAILABLE = False
+
+try:
+    import ijson
+    from ijson.common import ObjectBuilder
+    IJSON_AVAILABLE = True
+except ImportError:
+    ijson = None
+    IJSON_AVAILABLE = False
+
+# Parsed training files, marshalled so unchanged files skip JSON decoding; marshal only
+# reads plain data back, unlike pickle. The directory sits at the repository root whatever
+# the working directory, and each path has one cache file, overwritten when the file
+# changes, so stale parses never pile up
+JSON_CACHE_DIR = Path(REPO_ROOT) / ".hdr_cache"
+
+def load_cached_json(path) -> Any:
+    """Load a JSON file, reusing a marshalled parse while its mtime and size are unchanged."""
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    cache_file = JSON_CACHE_DIR / f"{hashlib.sha1(path.encode('utf-8')).hexdigest()}.bin"
+    
+    # The stamp is written ahead of the data, so a stale entry is rejected without loading it
+    try:
+        with open(cache_file, 'rb') as f:
+            if marshal.load(f) == stamp:
+                return marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    
+    with open(path, 'rb') as f:
+        data = loads_json(f.read())
+    
+    # Write to a unique temp name and rename so parallel workers never read a partial entry
+    tmp_file = cache_file.with_name(f"{cache_file.stem}.{os.getpid()}.tmp")
+    try:
+        JSON_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with open(tmp_file, 'wb') as f:
+            marshal.dump(stamp, f)
+            marshal.dump(data, f)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        pass
+    return data
+
+# Training files at least this large are streamed with stream_sheets instead of decoded
+# whole. Streaming walks every parse event in Python, which is far slower than orjson, so
+# it only pays off once a whole document would take too much memory
+STREAM_THRESHOLD_BYTES = 50 << 20
+
+_CONTAINER_STARTS = frozenset(('start_map', 'start_array'))
+_CONTAINER_ENDS = frozenset(('end_map', 'end_array'))
+
+def _build_value(event: str, value: Any, events) -> Any:
+    """Build the JSON value that starts with (event, value) from the rest of its events."""
+    builder = ObjectBuilder()
+    builder.event(event, value)
+    depth = event in _CONTAINER_STARTS
+    while depth:
+        _, event, value = next(events)
+        builder.event(event, value)
+        if event in _CONTAINER_STARTS:
+            depth += 1
+        elif event in _CONTAINER_ENDS:
+            depth -= 1
+    return builder.value
+
+def _skip_value(event: str, events) -> None:
+    """Consume the events of the JSON value that starts with `event` without building it."""
+    depth = event in _CONTAINER_STARTS
+    while depth:
+        event = next(events)[1]
+        if event in _CONTAINER_STARTS:
+            depth += 1
+        elif event in _CONTAINER_ENDS:
+            depth -= 1
+
+def stream_sheets(path, max_rows: int) -> Dict[str, Any]:
+    """
+    Load a structured JSON file with ijson, building only the first `max_rows` rows of
+    each sheet's "data" list; later rows are parsed but never turned into objects.
+    
+    Everything else (columns, other sheet keys, non-object sheets) is kept as is.
+    """
+    sheets = {}
+    with open(path, 'rb') as f:
+        events = ijson.parse(f, use_float=True)
+        _, event, value = next(events)
+        if event != 'start_map':
+            return _build_value(event, value, events)
+        for _, event, sheet_name in events:
+            if event == 'end_map':
+                break
+            _, event, value = next(events)
+            if event != 'start_map':
+                sheets[sheet_name] = _build_value(event, value, events)
+                continue
+            sheet = sheets[sheet_name] = {}
+            for _, event, key in events:
+                if event == 'end_map':
+                    break
+                _, event, value = next(events)
+                if key != 'data' or event != 'start_array':
+                    sheet[key] = _build_value(event, value, events)
+                    continue
+                rows = sheet[key] = []
+                for _, event, value in events:
+                    if event == 'end_array':
+                        break
+                    if len(rows) < max_rows:
+                        rows.append(_build_value(event, value, events))
+                    else:
+                        _skip_value(event, events)
+    return sheets
+
+# Matches generic column names like col_0, col_12
+_is_generic_column = re.compile(r'col_\d+').fullmatch
+
+# Shared 'col_N' key strings, grown on demand, so row scans don't format a new key per cell
+_COL_KEYS: List[str] = []
+
+def _col_keys(count: int) -> List[str]:
+    """Return the keys col_0 .. col_{count-1}."""
+    while len(_COL_KEYS) < count:
+        _COL_KEYS.append(f'col_{len(_COL_KEYS)}')
+    return _COL_KEYS[:count]
+
+# clean_header substitutions, compiled once
+_PREFIX_RE = re.compile(r'^(axis|bid|itemType|predefinedAlternativeBid)[:|\|]')
+_PIPE_SUFFIX_RE = re.compile(r'\|.*$')
+# Deletes parentheses and brackets in one C-level pass
+_BRACKETS_TABLE = str.maketrans('', '', '(){}[]')
+# Any run of whitespace and underscores collapses to a single underscore
+_SEPARATORS_RE = re.compile(r'[\s_]+')
 
 class HeaderDetector:
     """Intelligent header detection for messy JSON data files."""
@@ -35,6 +182,36 @@ class HeaderDetector:
             r'axis\(',  # Axis function calls
             r'bid\|',  # Bid system markers
         ]
+        
+        # One alternation answers "does any template pattern occur?"; clean_header keeps the
+        # individual patterns because it removes them one after another
+        self._template_res = [re.compile(pattern) for pattern in self.template_patterns]
+        self._template_re = re.compile('|'.join(f'(?:{pattern})' for pattern in self.template_patterns))
+        
+        # Match all business keywords in one scan per cell: an Aho-Corasick automaton when
+        # pyahocorasick is installed, otherwise a single compiled alternation
+        all_keywords = sorted({kw.lower() for keywords in self.business_keywords.values() for kw in keywords})
+        if AHOCORASICK_AVAILABLE:
+            self._keyword_automaton = ahocorasick.Automaton()
+            for keyword in all_keywords:
+                self._keyword_automaton.add_word(keyword, keyword)
+            self._keyword_automaton.make_automaton()
+        else:
+            self._keyword_automaton = None
+            self._keyword_re = re.compile('|'.join(map(re.escape, all_keywords)))
+        
+        # The same cell text recurs across rows and sheets, so cache its keyword/template flags
+        self._cell_flags = lru_cache(maxsize=65536)(self._compute_cell_flags)
+    
+    def _compute_cell_flags(self, value: str) -> Tuple[bool, bool]:
+        """Return (has_business_keyword, has_template_pattern) for one cell value."""
+        value_lower = value.lower()
+        if self._keyword_automaton is not None:
+            has_keyword = next(self._keyword_automaton.iter(value_lower), None) is not None
+        else:
+            has_keyword = self._keyword_re.search(value_lower) is not None
+        has_template = self._template_re.search(value) is not None
+        return has_keyword, has_template
     
     def score_header_row(self, row_data: Dict[str, Any], column_count: int) -> Tuple[float, Dict[str, Any]]:
         """
@@ -55,43 +232,41 @@ class HeaderDetector:
         }
         
         values = []
-        for i in range(column_count):
-            val = str(row_data.get(f'col_{i}', '')).strip()
+        for key in _col_keys(column_count):
+            val = str(row_data.get(key, '')).strip()
             if val and val.lower() != 'nan':
                 values.append(val)
                 analysis['non_empty_count'] += 1
                 
                 # Collect sample values
                 if len(analysis['sample_values']) < 10:
-                    analysis['sample_values'].append(f'col_{i}: "{val}"')
+                    analysis['sample_values'].append(f'{key}: "{val}"')
         
         if not values:
             return 0.0, analysis
         
-        # Calculate metrics
-        analysis['unique_values'] = len(set(values))
-        analysis['avg_length'] = statistics.mean([len(v) for v in values])
-        
-        # Check for business keywords
-        for value in values:
-            value_lower = value.lower()
-            for category, keywords in self.business_keywords.items():
-                if any(keyword in value_lower for keyword in keywords):
-                    analysis['business_keyword_matches'] += 1
-                    break
-        
-        # Check for template patterns
+        # Calculate all per-value metrics in a single pass
+        total_length = 0
+        keyword_matches = template_matches = underscores = all_caps = 0
         for value in values:
-            for pattern in self.template_patterns:
-                if re.search(pattern, value):
-                    analysis['template_pattern_matches'] += 1
-                    break
+            total_length += len(value)
+            has_keyword, has_template = self._cell_flags(value)
+            if has_keyword:
+                keyword_matches += 1
+            if has_template:
+                template_matches += 1
+            # Underscore naming and ALL CAPS are both common in headers
+            if '_' in value:
+                underscores += 1
+            if value.isupper() and len(value) > 2:
+                all_caps += 1
         
-        # Check for underscore naming (common in headers)
-        analysis['contains_underscores'] = sum(1 for v in values if '_' in v)
-        
-        # Check for ALL CAPS (common in headers)
-        analysis['all_caps_ratio'] = sum(1 for v in values if v.isupper() and len(v) > 2) / len(values)
+        analysis['unique_values'] = len(set(values))
+        analysis['avg_length'] = total_length / len(values)
+        analysis['business_keyword_matches'] = keyword_matches
+        analysis['template_pattern_matches'] = template_matches
+        analysis['contains_underscores'] = underscores
+        analysis['all_caps_ratio'] = all_caps / len(values)
         
         # Calculate composite score
         score = 0.0
@@ -165,14 +340,14 @@ class HeaderDetector:
         
         headers = {}
         
-        for i in range(column_count):
-            raw_header = str(header_row.get(f'col_{i}', '')).strip()
+        for key in _col_keys(column_count):
+            raw_header = str(header_row.get(key, '')).strip()
             
             if raw_header and raw_header.lower() != 'nan':
                 # Clean up the header
                 cleaned = self.clean_header(raw_header)
                 if cleaned:
-                    headers[f'col_{i}'] = cleaned
+                    headers[key] = cleaned
         
         return headers
     
@@ -180,20 +355,19 @@ class HeaderDetector:
         """Clean and normalize a raw header value."""
         # Remove template markers
         cleaned = raw_header
-        for pattern in self.template_patterns:
-            cleaned = re.sub(pattern, '', cleaned)
+        for pattern_re in self._template_res:
+            cleaned = pattern_re.sub('', cleaned)
         
         # Remove common prefixes/suffixes
-        cleaned = re.sub(r'^(axis|bid|itemType|predefinedAlternativeBid)[:|\|]', '', cleaned)
-        cleaned = re.sub(r'\|.*$', '', cleaned)  # Remove everything after |
+        cleaned = _PREFIX_RE.sub('', cleaned)
+        if '|' in cleaned:
+            cleaned = _PIPE_SUFFIX_RE.sub('', cleaned)  # Remove everything after |
         
         # Clean up parentheses and brackets
-        cleaned = re.sub(r'[(){}\[\]]', '', cleaned)
+        cleaned = cleaned.translate(_BRACKETS_TABLE)
         
         # Normalize whitespace and underscores
-        cleaned = re.sub(r'\s+', '_', cleaned.strip())
-        cleaned = re.sub(r'_+', '_', cleaned)
-        cleaned = cleaned.strip('_')
+        cleaned = _SEPARATORS_RE.sub('_', cleaned.strip()).strip('_')
         
         # Convert to lowercase for consistency
         cleaned = cleaned.lower()
@@ -208,8 +382,7 @@ class HeaderDetector:
             Comprehensive analysis of all sheets in the file
         """
         try:
-            with open(file_path, 'r') as f:
-                data = json.load(f)
+            data = load_cached_json(file_path)
         except Exception as e:
             return {'error': f'Failed to load file: {e}'}
         
@@ -232,8 +405,7 @@ class HeaderDetector:
             
             # Check if this sheet has generic headers
             columns = sheet_data['columns']
-            generic_pattern = re.compile(r'^col_\d+$')
-            has_generic = any(generic_pattern.match(col) for col in columns)
+            has_generic = any(map(_is_generic_column, columns))
             
             if has_generic:
                 file_analysis['summary']['sheets_with_generic_headers'] += 1
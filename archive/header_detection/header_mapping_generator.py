@@ -8,29 +8,111 @@ to provide better header names for human interpretation while keeping the AI mod
 unchanged.
 """
 
-import json
+import argparse
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, Any
-from practical_header_detection import detect_real_headers
+from typing import Dict, Any, Tuple
+
+import repo_root  # noqa: F401  (puts the repository root on sys.path)
+from filing_assistant.store import dump_json, loads_json
+from practical_header_detection import detect_real_header_rows, list_training_files
+
+# Key of the last line of the JSONL mappings file, which holds the run metadata
+METADATA_KEY = "__metadata__"
+
+# Version 2 adds "header_rows" (sheet -> data row practical detection took the business
+# headers from) to each file; it is not the row io_utils.detect_header_row would pick
+SCHEMA_VERSION = 2
+
+def jsonl_paths(output_path: Path) -> Tuple[Path, Path]:
+    """Return (jsonl_path, partial_path) for a mappings file.
+    
+    The JSONL file holds one {file_name: file_mapping} line per training file followed by a
+    metadata line; it is appended to while the run progresses under the partial name and
+    renamed into place once the run completes.
+    """
+    jsonl_path = output_path.with_suffix(".jsonl")
+    return jsonl_path, jsonl_path.with_name(jsonl_path.name + ".partial")
+
+def read_mappings_jsonl(jsonl_path: Path) -> Dict[str, Any]:
+    """Rebuild the mappings dict from a JSONL mappings file, one line at a time.
+    
+    A truncated last line, as left by an interrupted run, ends the read.
+    """
+    mappings = {"metadata": {}, "file_mappings": {}}
+    with open(jsonl_path, 'rb') as f:
+        for line in f:
+            try:
+                entry = loads_json(line)
+            except ValueError:
+                break
+            if METADATA_KEY in entry:
+                mappings["metadata"] = entry[METADATA_KEY]
+            else:
+                mappings["file_mappings"].update(entry)
+    return mappings
 
-def generate_header_mappings(training_dir: str, output_file: str = "header_mappings.json") -> Dict[str, Any]:
+def load_previous_mappings(output_path: Path) -> Dict[str, Any]:
+    """Return the file_mappings of an earlier run, or {} if there is none.
+    
+    Entries that an interrupted run already appended to its partial JSONL file are
+    included, so a restarted run resumes instead of starting over.
+    """
+    try:
+        previous = loads_json(output_path.read_bytes()).get("file_mappings", {})
+    except (OSError, ValueError, AttributeError):
+        previous = {}
+    
+    partial_path = jsonl_paths(output_path)[1]
+    if partial_path.exists():
+        previous.update(read_mappings_jsonl(partial_path)["file_mappings"])
+    return previous
+
+def generate_header_mappings(training_dir: str, output_file: str = "header_mappings.json",
+                             force: bool = False, pretty: bool = False,
+                             verbose: bool = False) -> Dict[str, Any]:
     """
     Generate header mappings for all training files.
     
+    Each entry is stamped with its file's mtime and size; on later runs files whose stamp
+    is unchanged reuse the previous result instead of being parsed and scored again.
+    
     Args:
         training_dir: Directory containing training JSON files
         output_file: Output file for header mappings
+        force: Re-run detection on every file, ignoring the previous output
+        pretty: Indent the output file for human inspection (compact by default)
+        verbose: Print a per-file progress block (only the summary otherwise)
         
     Returns:
         Dictionary containing all header mappings
     """
-    training_path = Path(training_dir)
-    json_files = list(training_path.glob("*_structured.json"))
+    json_files = list_training_files(training_dir)
+    output_path = Path(training_dir) / output_file
+    
+    # Reuse detections for files that are unchanged since the previous run
+    previous = {} if force else load_previous_mappings(output_path)
+    # DirEntry.stat() results are cached on the entry, so later lookups are free
+    cached = {}
+    for json_file in json_files:
+        entry = previous.get(json_file.name)
+        st = json_file.stat()
+        if entry and entry.get("_mtime_ns") == st.st_mtime_ns and entry.get("_size") == st.st_size:
+            if not entry.get("has_generic_headers"):
+                cached[json_file.name] = {}
+            elif "header_rows" in entry:  # Entries from before schema 2 are detected again
+                cached[json_file.name] = {
+                    sheet_name: (entry["header_rows"][sheet_name], mapping)
+                    for sheet_name, mapping in entry["sheet_mappings"].items()
+                }
+    to_detect = [json_file.path for json_file in json_files if json_file.name not in cached]
     
     header_mappings = {
         "metadata": {
             "generated_by": "header_mapping_generator.py",
+            "schema_version": SCHEMA_VERSION,
             "training_directory": training_dir,
             "total_files_processed": 0,
             "files_with_generic_headers": 0,
@@ -42,47 +124,72 @@ def generate_header_mappings(training_dir: str, output_file: str = "header_mappi
     
     print(f"🔍 Generating header mappings for {len(json_files)} files...")
     print("=" * 60)
-    
-    for json_file in sorted(json_files):
-        file_name = json_file.name
-        print(f"\n📁 Processing: {file_name}")
-        
-        header_mappings["metadata"]["total_files_processed"] += 1
+    if cached:
+        print(f"♻️  Reusing {len(cached)} unchanged files from {output_path.name}")
+    
+    # Each file's entry is appended to the JSONL file as soon as it is ready, so an
+    # interrupted run can pick up where it stopped
+    jsonl_path, partial_path = jsonl_paths(output_path)
+    
+    # Files are independent, so detect them across processes; map() yields results in
+    # file order and all reporting stays here in the parent
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor, \
+            open(partial_path, 'wb') as jsonl_file:
+        results = executor.map(detect_real_header_rows, to_detect, chunksize=4)
         
-        # Detect headers for this file
-        detected_headers = detect_real_headers(str(json_file))
-        
-        if detected_headers:
-            header_mappings["metadata"]["files_with_generic_headers"] += 1
+        for json_file in json_files:
+            file_name = json_file.name
+            detected_headers = cached[file_name] if file_name in cached else next(results)
+            # Per-file lines are collected and written in one go, and only when verbose
+            lines = [f"\n📁 Processing: {file_name}"]
+            put = lines.append
             
-            file_mapping = {
-                "file_path": str(json_file),
-                "has_generic_headers": True,
-                "sheet_mappings": {}
-            }
+            header_mappings["metadata"]["total_files_processed"] += 1
             
-            total_headers_detected = 0
+            if detected_headers:
+                header_mappings["metadata"]["files_with_generic_headers"] += 1
+                
+                file_mapping = {
+                    "file_path": json_file.path,
+                    "has_generic_headers": True,
+                    "sheet_mappings": {},
+                    "header_rows": {},
+                    "_mtime_ns": json_file.stat().st_mtime_ns,
+                    "_size": json_file.stat().st_size
+                }
+                
+                total_headers_detected = 0
+                
+                for sheet_name, (header_row_idx, mapping) in detected_headers.items():
+                    if mapping:
+                        file_mapping["sheet_mappings"][sheet_name] = mapping
+                        file_mapping["header_rows"][sheet_name] = header_row_idx
+                        total_headers_detected += len(mapping)
+                        put(f"   📋 {sheet_name}: {len(mapping)} headers detected")
+                
+                if total_headers_detected > 0:
+                    header_mappings["metadata"]["files_with_detected_headers"] += 1
+                    file_mapping["total_headers_detected"] = total_headers_detected
+                    header_mappings["file_mappings"][file_name] = file_mapping
+                    put(f"   ✅ Total headers detected: {total_headers_detected}")
+                else:
+                    put(f"   ❌ No headers could be detected")
+            else:
+                put(f"   ✅ File has proper headers (no conversion needed)")
+                header_mappings["file_mappings"][file_name] = {
+                    "file_path": json_file.path,
+                    "has_generic_headers": False,
+                    "sheet_mappings": {},
+                    "_mtime_ns": json_file.stat().st_mtime_ns,
+                    "_size": json_file.stat().st_size
+                }
             
-            for sheet_name, mapping in detected_headers.items():
-                if mapping:
-                    file_mapping["sheet_mappings"][sheet_name] = mapping
-                    total_headers_detected += len(mapping)
-                    print(f"   📋 {sheet_name}: {len(mapping)} headers detected")
+            if file_name in header_mappings["file_mappings"]:
+                jsonl_file.write(dump_json({file_name: header_mappings["file_mappings"][file_name]}, indent=False) + b"\n")
+                jsonl_file.flush()
             
-            if total_headers_detected > 0:
-                header_mappings["metadata"]["files_with_detected_headers"] += 1
-                file_mapping["total_headers_detected"] = total_headers_detected
-                header_mappings["file_mappings"][file_name] = file_mapping
-                print(f"   ✅ Total headers detected: {total_headers_detected}")
-            else:
-                print(f"   ❌ No headers could be detected")
-        else:
-            print(f"   ✅ File has proper headers (no conversion needed)")
-            header_mappings["file_mappings"][file_name] = {
-                "file_path": str(json_file),
-                "has_generic_headers": False,
-                "sheet_mappings": {}
-            }
+            if verbose:
+                sys.stdout.write("\n".join(lines) + "\n")
     
     # Generate statistics
     metadata = header_mappings["metadata"]
@@ -92,10 +199,18 @@ def generate_header_mappings(training_dir: str, output_file: str = "header_mappi
     else:
         metadata["detection_statistics"]["success_rate"] = 0.0
     
-    # Save mappings to file
-    output_path = Path(training_dir) / output_file
-    with open(output_path, 'w') as f:
-        json.dump(header_mappings, f, indent=2)
+    # Save mappings to file via a temp file and rename, so an interrupted write never
+    # leaves a truncated mappings file; the JSONL file ends with the metadata line
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    try:
+        tmp_path.write_bytes(dump_json(header_mappings, indent=pretty))
+        os.replace(tmp_path, output_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    with open(partial_path, 'ab') as jsonl_file:
+        jsonl_file.write(dump_json({METADATA_KEY: metadata}, indent=False) + b"\n")
+    os.replace(partial_path, jsonl_path)
     
     print(f"\n💾 Header mappings saved to: {output_path}")
     print_mapping_summary(header_mappings)
@@ -132,35 +247,53 @@ def create_enhanced_io_utils_integration() -> str:
 # Add this to io_utils.py for header mapping integration
 
 import json
+import os
+from functools import lru_cache
 from pathlib import Path
 
-# Global variable to cache header mappings
+# Cached header mappings and the mtime of the file they were loaded from
 _header_mappings = None
+_header_mappings_mtime = None
 
 def load_header_mappings(training_dir: str = None) -> Dict[str, Any]:
-    """Load header mappings from the mapping file."""
-    global _header_mappings
-    
-    if _header_mappings is not None:
-        return _header_mappings
+    """Load header mappings, re-reading the file only after it has been regenerated."""
+    global _header_mappings, _header_mappings_mtime
     
     if training_dir is None:
         training_dir = "training_files2"  # Default directory
     
     mapping_file = Path(training_dir) / "header_mappings.json"
     
-    if not mapping_file.exists():
+    try:
+        mtime = os.stat(mapping_file).st_mtime_ns
+    except OSError:
         print(f"⚠️  Header mapping file not found: {mapping_file}")
         return {}
     
+    if _header_mappings is not None and mtime == _header_mappings_mtime:
+        return _header_mappings
+    
     try:
         with open(mapping_file, 'r') as f:
             _header_mappings = json.load(f)
+        _header_mappings_mtime = mtime
+        _sheet_map.cache_clear()
         return _header_mappings
     except Exception as e:
         print(f"❌ Error loading header mappings: {e}")
         return {}
 
+@lru_cache(maxsize=None)
+def _sheet_map(file_name: str, sheet_name: str) -> Dict[int, str]:
+    """Column index -> business header for one sheet, resolved once per mappings load."""
+    file_mapping = _header_mappings["file_mappings"].get(file_name, {})
+    
+    if not file_mapping.get("has_generic_headers", False):
+        return {}  # File already has good headers
+    
+    header_mapping = file_mapping.get("sheet_mappings", {}).get(sheet_name, {})
+    return {int(col_key[len("col_"):]): header for col_key, header in header_mapping.items()}
+
 def get_enhanced_headers(file_path: str, sheet_name: str, original_headers: List[str]) -> List[str]:
     """
     Get enhanced headers using mappings if available, otherwise return original headers.
@@ -178,34 +311,13 @@ def get_enhanced_headers(file_path: str, sheet_name: str, original_headers: List
     if not mappings or "file_mappings" not in mappings:
         return original_headers
     
-    file_name = Path(file_path).name
-    
-    if file_name not in mappings["file_mappings"]:
-        return original_headers
-    
-    file_mapping = mappings["file_mappings"][file_name]
+    sheet_map = _sheet_map(Path(file_path).name, sheet_name)
     
-    if not file_mapping.get("has_generic_headers", False):
-        return original_headers  # File already has good headers
-    
-    sheet_mappings = file_mapping.get("sheet_mappings", {})
-    
-    if sheet_name not in sheet_mappings:
+    if not sheet_map:
         return original_headers  # No mapping for this sheet
     
-    # Apply header mapping
-    header_mapping = sheet_mappings[sheet_name]
-    enhanced_headers = []
-    
-    for i, original_header in enumerate(original_headers):
-        # Try to find mapping for this column
-        col_key = f"col_{i}"
-        if col_key in header_mapping:
-            enhanced_headers.append(header_mapping[col_key])
-        else:
-            enhanced_headers.append(original_header)  # Keep original if no mapping
-    
-    return enhanced_headers
+    # Keep the original header wherever a column has no mapping
+    return [sheet_map.get(i, header) for i, header in enumerate(original_headers)]
 
 def load_structured_data_enhanced(file_path: str) -> Dict[str, Any]:
     """
@@ -224,8 +336,8 @@ def load_structured_data_enhanced(file_path: str) -> Dict[str, Any]:
         # Get original headers
         original_headers = sheet_data['columns']
         
-        # Detect header row (use existing logic)
-        header_row_idx, detected_headers = detect_header_row(sheet_data)
+        # Detect header row (use existing logic); returns (headers, header_row_index)
+        detected_headers, header_row_idx = detect_header_row(sheet_data)
         
         # Enhance headers with mappings
         enhanced_headers = get_enhanced_headers(file_path, sheet_name, detected_headers)
@@ -249,6 +361,12 @@ def load_structured_data_enhanced(file_path: str) -> Dict[str, Any]:
 
 def main():
     """Main function to generate header mappings."""
+    parser = argparse.ArgumentParser(description="Generate header mappings for training files")
+    parser.add_argument("--pretty", action="store_true", help="write indented JSON for human inspection")
+    parser.add_argument("--force", action="store_true", help="re-run detection on every file")
+    parser.add_argument("--verbose", action="store_true", help="print progress for every file")
+    args = parser.parse_args()
+    
     training_dir = "training_files2"
     
     print("🎯 HEADER MAPPING GENERATOR")
@@ -257,7 +375,8 @@ def main():
     print()
     
     # Generate mappings
-    mappings = generate_header_mappings(training_dir)
+    mappings = generate_header_mappings(training_dir, force=args.force, pretty=args.pretty,
+                                        verbose=args.verbose)
     
     print(f"\n🔧 INTEGRATION CODE:")
     print("=" * 20)
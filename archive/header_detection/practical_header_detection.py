@@ -6,10 +6,104 @@ This module provides a simple interface to improve header detection
 for the filing assistant system when dealing with generic column names.
 """
 
-import json
+import mmap
+import os
 import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Dict, List, Tuple, Optional, Any
-from pathlib import Path
+
+import repo_root  # noqa: F401  (puts the repository root on sys.path)
+from filing_assistant.store import loads_json
+from header_detector import IJSON_AVAILABLE, STREAM_THRESHOLD_BYTES, _col_keys, stream_sheets
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    ahocorasick = None
+    AHOCORASICK_AVAILABLE = False
+
+# Header search only looks at the first rows of each sheet
+MAX_SEARCH_ROWS = 50
+
+def list_training_files(training_dir: str) -> List[os.DirEntry]:
+    """Return the directory's *_structured.json files sorted by name, using a single scandir pass."""
+    with os.scandir(training_dir) as it:
+        entries = [e for e in it if e.name.endswith("_structured.json") and e.is_file()]
+    entries.sort(key=lambda e: e.name)
+    return entries
+
+def load_sheets(json_file_path: str) -> Dict[str, Any]:
+    """
+    Load a structured JSON file for header detection.
+    
+    Large files are streamed with ijson when it is installed, building only the first
+    MAX_SEARCH_ROWS data rows of each sheet.
+    """
+    if not IJSON_AVAILABLE or os.path.getsize(json_file_path) < STREAM_THRESHOLD_BYTES:
+        with open(json_file_path, 'rb') as f:
+            return loads_json(f.read())
+    return stream_sheets(json_file_path, MAX_SEARCH_ROWS)
+
+def may_have_generic_columns(json_file_path: str) -> bool:
+    """
+    Cheap byte probe run before parsing a file.
+    
+    Every generic column name is serialized as a string starting with "col_, so a file
+    without that byte sequence cannot have a sheet that needs header detection.
+    """
+    with open(json_file_path, 'rb') as f:
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return mm.find(b'"col_') != -1
+        except ValueError:
+            return True  # Empty files cannot be mapped; let the loader report them
+
+# Generic column names like col_0, col_12
+_GENERIC_COL_RE = re.compile(r'^col_\d+$')
+
+# Business keywords that indicate header content
+BUSINESS_KEYWORDS = (
+    'lane', 'service', 'port', 'origin', 'destination', 'carrier', 'freight',
+    'cost', 'price', 'rate', 'fee', 'charge', 'amount', 'total', 'minimum',
+    'weight', 'cbm', 'volume', 'kilos', 'country', 'region', 'date', 'currency',
+    'id', 'code', 'number', 'reference', 'quote', 'bid', 'proposal'
+)
+# Finds any keyword as a substring in one scan: an Aho-Corasick automaton when
+# pyahocorasick is installed, otherwise a single compiled alternation
+_BUSINESS_RE = re.compile('|'.join(map(re.escape, BUSINESS_KEYWORDS)))
+if AHOCORASICK_AVAILABLE:
+    _BUSINESS_AUTOMATON = ahocorasick.Automaton()
+    for _keyword in BUSINESS_KEYWORDS:
+        _BUSINESS_AUTOMATON.add_word(_keyword, _keyword)
+    _BUSINESS_AUTOMATON.make_automaton()
+else:
+    _BUSINESS_AUTOMATON = None
+
+def has_business_keyword(value_lower: str) -> bool:
+    """Return True if any business keyword occurs in the lowercased value."""
+    if _BUSINESS_AUTOMATON is not None:
+        return next(_BUSINESS_AUTOMATON.iter(value_lower), None) is not None
+    return _BUSINESS_RE.search(value_lower) is not None
+
+# Template markers that indicate a header row, as one alternation
+_TEMPLATE_RE = re.compile(r'<<.*?>>|axis\(|bid\|')
+
+# The same cell text recurs across rows, sheets and files, so remember its flags
+@lru_cache(maxsize=65536)
+def _cell_flags(value: str) -> Tuple[bool, bool]:
+    """Return (has_business_keyword, has_template_pattern) for one cell value."""
+    return has_business_keyword(value.lower()), _TEMPLATE_RE.search(value) is not None
+
+# clean_header_name substitutions, applied in this order
+_CLEAN_TEMPLATE_RE = re.compile(r'<<.*?>>')
+_CLEAN_AXIS_RE = re.compile(r'axis\([^)]*\)')
+_CLEAN_BID_RE = re.compile(r'bid\|[^>]*')
+_CLEAN_BRACKETS_TABLE = str.maketrans('', '', '(){}[]')
+_CLEAN_TAIL_RE = re.compile(r'[:|].*$')
+_UNDERSCORES_RE = re.compile(r'_+')
 
 def detect_real_headers(json_file_path: str) -> Dict[str, Dict[str, str]]:
     """
@@ -21,9 +115,20 @@ def detect_real_headers(json_file_path: str) -> Dict[str, Dict[str, str]]:
     Returns:
         Dictionary mapping sheet names to column mappings (col_X -> real_header)
     """
+    return {sheet_name: header_mapping
+            for sheet_name, (_, header_mapping) in detect_real_header_rows(json_file_path).items()}
+
+def detect_real_header_rows(json_file_path: str) -> Dict[str, Tuple[int, Dict[str, str]]]:
+    """
+    Like detect_real_headers, but also report the data row each sheet's headers came from.
+    
+    Returns:
+        Dictionary mapping sheet names to (header_row_idx, column mapping)
+    """
     try:
-        with open(json_file_path, 'r') as f:
-            data = json.load(f)
+        if not may_have_generic_columns(json_file_path):
+            return {}  # No generic column names anywhere, skip the parse
+        data = load_sheets(json_file_path)
     except Exception as e:
         print(f"❌ Error loading {json_file_path}: {e}")
         return {}
@@ -36,78 +141,70 @@ def detect_real_headers(json_file_path: str) -> Dict[str, Dict[str, str]]:
             
         # Check if this sheet has generic headers
         columns = sheet_data['columns']
-        has_generic = any(re.match(r'^col_\d+$', col) for col in columns)
+        has_generic = any(map(_GENERIC_COL_RE.match, columns))
         
         if not has_generic:
             continue  # Skip sheets that already have good headers
             
         # Find the best header row
-        header_mapping = find_best_headers(sheet_data)
+        header_row_idx, header_mapping = find_header_row(sheet_data)
         if header_mapping:
-            result[sheet_name] = header_mapping
+            result[sheet_name] = (header_row_idx, header_mapping)
     
     return result
 
 def find_best_headers(sheet_data: Dict[str, Any]) -> Dict[str, str]:
     """Find the best header row in a sheet and extract clean headers."""
-    
-    # Business keywords that indicate header content
-    business_keywords = [
-        'lane', 'service', 'port', 'origin', 'destination', 'carrier', 'freight',
-        'cost', 'price', 'rate', 'fee', 'charge', 'amount', 'total', 'minimum',
-        'weight', 'cbm', 'volume', 'kilos', 'country', 'region', 'date', 'currency',
-        'id', 'code', 'number', 'reference', 'quote', 'bid', 'proposal'
-    ]
-    
-    # Template patterns
-    template_patterns = [r'<<.*?>>', r'axis\(', r'bid\|']
+    return find_header_row(sheet_data)[1]
+
+def find_header_row(sheet_data: Dict[str, Any]) -> Tuple[int, Dict[str, str]]:
+    """Return (header_row_idx, clean headers) for a sheet, or (-1, {}) if no row qualifies."""
     
     column_count = len(sheet_data['columns'])
     data_rows = sheet_data['data']
+    col_keys = _col_keys(column_count)
     
     best_score = 0
     best_row_idx = -1
     
-    # Search first 50 rows for headers
-    for row_idx in range(min(50, len(data_rows))):
+    # Search first rows for headers
+    for row_idx in range(min(MAX_SEARCH_ROWS, len(data_rows))):
         row = data_rows[row_idx]
         
         # Count non-empty values
-        values = []
-        for i in range(column_count):
-            val = str(row.get(f'col_{i}', '')).strip()
-            if val and val.lower() != 'nan':
-                values.append(val)
+        row_get = row.get
+        values = [val for val in (str(row_get(key, '')).strip() for key in col_keys)
+                  if val and val.lower() != 'nan']
         
         if len(values) < 3:  # Need at least 3 non-empty values
             continue
         
-        # Score this row
-        score = 0
-        
-        # Check for business keywords
-        keyword_matches = 0
-        for value in values:
-            value_lower = value.lower()
-            if any(keyword in value_lower for keyword in business_keywords):
-                keyword_matches += 1
+        # Bonus for coverage (many non-empty columns)
+        coverage = len(values) / column_count
         
-        score += (keyword_matches / len(values)) * 50
+        # Skip rows that could not beat the best score even if every value matched
+        # (terms added in the same order as the score below, so the bound is exact)
+        if 50 + 40 + coverage * 30 + 20 <= best_score:
+            continue
         
-        # Check for template patterns
-        template_matches = 0
+        # Count business keywords, template patterns and underscores in one pass
+        keyword_matches = template_matches = underscore_count = 0
         for value in values:
-            if any(re.search(pattern, value) for pattern in template_patterns):
+            has_keyword, has_template = _cell_flags(value)
+            if has_keyword:
+                keyword_matches += 1
+            if has_template:
                 template_matches += 1
+            if '_' in value:
+                underscore_count += 1
         
+        # Score this row
+        score = 0
+        score += (keyword_matches / len(values)) * 50
         score += (template_matches / len(values)) * 40
-        
-        # Bonus for coverage (many non-empty columns)
-        coverage = len(values) / column_count
         score += coverage * 30
         
         # Bonus for underscores (common in headers)
-        underscore_count = sum(1 for v in values if '_' in v)
         score += (underscore_count / len(values)) * 20
         
         if score > best_score:
@@ -116,40 +213,47 @@ def find_best_headers(sheet_data: Dict[str, Any]) -> Dict[str, str]:
     
     # Extract headers from best row
     if best_row_idx >= 0 and best_score > 15:  # Minimum threshold
-        return extract_clean_headers(data_rows[best_row_idx], column_count)
+        return best_row_idx, extract_clean_headers(data_rows[best_row_idx], column_count)
     
-    return {}
+    return -1, {}
 
 def extract_clean_headers(header_row: Dict[str, Any], column_count: int) -> Dict[str, str]:
     """Extract and clean headers from a row."""
     headers = {}
     
-    for i in range(column_count):
-        raw_header = str(header_row.get(f'col_{i}', '')).strip()
+    for key in _col_keys(column_count):
+        raw_header = str(header_row.get(key, '')).strip()
         
         if raw_header and raw_header.lower() != 'nan':
             cleaned = clean_header_name(raw_header)
             if cleaned:
-                headers[f'col_{i}'] = cleaned
+                headers[key] = cleaned
     
     return headers
 
 def clean_header_name(raw_header: str) -> str:
     """Clean a raw header value into a usable name."""
-    # Remove template markers
-    cleaned = re.sub(r'<<.*?>>', '', raw_header)
-    cleaned = re.sub(r'axis\([^)]*\)', '', cleaned)
-    cleaned = re.sub(r'bid\|[^>]*', '', cleaned)
+    # Remove template markers; each removal can expose the next pattern, so they stay
+    # separate passes, run only when their literal prefix is present
+    cleaned = raw_header
+    if '<<' in cleaned:
+        cleaned = _CLEAN_TEMPLATE_RE.sub('', cleaned)
+    if 'axis(' in cleaned:
+        cleaned = _CLEAN_AXIS_RE.sub('', cleaned)
+    if 'bid|' in cleaned:
+        cleaned = _CLEAN_BID_RE.sub('', cleaned)
     
     # Remove parentheses and brackets
-    cleaned = re.sub(r'[(){}\[\]]', '', cleaned)
+    cleaned = cleaned.translate(_CLEAN_BRACKETS_TABLE)
     
     # Clean up separators
-    cleaned = re.sub(r'[:|].*$', '', cleaned)  # Remove everything after : or |
+    if ':' in cleaned or '|' in cleaned:
+        cleaned = _CLEAN_TAIL_RE.sub('', cleaned)  # Remove everything after : or |
     
-    # Normalize to snake_case
-    cleaned = re.sub(r'\s+', '_', cleaned.strip())
-    cleaned = re.sub(r'_+', '_', cleaned)
+    # Normalize to snake_case (str.split() splits on the same whitespace as \s+)
+    cleaned = '_'.join(cleaned.split())
+    if '__' in cleaned:
+        cleaned = _UNDERSCORES_RE.sub('_', cleaned)
     cleaned = cleaned.strip('_').lower()
     
     return cleaned if len(cleaned) > 0 else ''
@@ -160,43 +264,47 @@ def create_header_mapping_report(training_dir: str) -> None:
     print("🔍 HEADER DETECTION REPORT")
     print("=" * 50)
     
-    training_path = Path(training_dir)
-    json_files = list(training_path.glob("*_structured.json"))
+    json_files = list_training_files(training_dir)
     
     total_files = len(json_files)
     files_with_generic = 0
     files_with_detected_headers = 0
     
-    for json_file in sorted(json_files):
-        print(f"\n📁 {json_file.name}")
-        print("-" * 40)
-        
-        header_mappings = detect_real_headers(str(json_file))
-        
-        if not header_mappings:
-            print("   ✅ No generic headers detected (good quality)")
-            continue
-        
-        files_with_generic += 1
+    # Reading and parsing dominate for the many small training files, so overlap them
+    # across threads; map() keeps results in file order for the report
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+        results = executor.map(detect_real_headers, [json_file.path for json_file in json_files])
         
-        has_detections = False
-        for sheet_name, mapping in header_mappings.items():
-            if mapping:
-                has_detections = True
-                print(f"   📋 {sheet_name}:")
-                print(f"      🎯 Detected {len(mapping)} headers:")
-                
-                # Show sample mappings
-                for col, header in list(mapping.items())[:5]:
-                    print(f"         {col} → '{header}'")
-                
-                if len(mapping) > 5:
-                    print(f"         ... and {len(mapping) - 5} more")
-        
-        if has_detections:
-            files_with_detected_headers += 1
-        else:
-            print("   ❌ No headers could be detected")
+        for json_file, header_mappings in zip(json_files, results):
+            # Each file's block is written in one go instead of a print() per line
+            lines = [f"\n📁 {json_file.name}", "-" * 40]
+            
+            if not header_mappings:
+                lines.append("   ✅ No generic headers detected (good quality)")
+                sys.stdout.write("\n".join(lines) + "\n")
+                continue
+            
+            files_with_generic += 1
+            
+            has_detections = False
+            for sheet_name, mapping in header_mappings.items():
+                if mapping:
+                    has_detections = True
+                    lines.append(f"   📋 {sheet_name}:")
+                    lines.append(f"      🎯 Detected {len(mapping)} headers:")
+                    
+                    # Show sample mappings
+                    for col, header in list(mapping.items())[:5]:
+                        lines.append(f"         {col} → '{header}'")
+                    
+                    if len(mapping) > 5:
+                        lines.append(f"         ... and {len(mapping) - 5} more")
+            
+            if has_detections:
+                files_with_detected_headers += 1
+            else:
+                lines.append("   ❌ No headers could be detected")
+            sys.stdout.write("\n".join(lines) + "\n")
     
     print(f"\n📊 SUMMARY")
     print("=" * 20)
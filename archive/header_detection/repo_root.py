@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+"""
+Put the repository root on sys.path so the header detection scripts can share the
+filing_assistant package's helpers. Import it before any filing_assistant import.
+"""
+
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
@@ -1,30 +1,38 @@
 from __future__ import annotations
-import json, typer, os
-from rich import print, box
+import contextlib, hashlib, json, marshal, typer, os, sys
+from collections import Counter, defaultdict
+from rich import print, box, get_console
 from rich.table import Table
 from rich.panel import Panel
+from rich.progress import Progress, TextColumn, BarColumn, MofNCompleteColumn, TimeElapsedColumn
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
-from .store import load_store, save_store
+from .store import load_store, load_store_cached, save_store, read_json, write_json
 from .trainer import pair_training_files
 from .enhanced_trainer import enhanced_learn_from_pair, enhanced_merge_patterns
 from .identifier import identify_required_columns, enhanced_identify_required_columns
 
-# Add the enhanced header detector import
-try:
-    from .enhanced_header_detector import EnhancedHeaderDetector
-    ENHANCED_HEADERS_AVAILABLE = True
-except ImportError:
-    ENHANCED_HEADERS_AVAILABLE = False
-    print("[yellow]⚠️  Enhanced header detection not available. Install required dependencies.[/yellow]")
-
 app = typer.Typer(add_completion=False)
 
-def display_training_results(training_results: list, out_store: str, total_pairs: int):
-    """Display comprehensive training results with file, sheet, and column details"""
+def _require_enhanced_headers() -> None:
+    """Exit unless the enhanced header detector can be imported.
+
+    Checked by the commands that need it rather than at import, so --help, serve and update start fast."""
+    try:
+        from .enhanced_header_detector import EnhancedHeaderDetector  # noqa: F401
+    except ImportError:
+        print("[red]❌ Error: OpenAI integration required for AI-enhanced Filing Assistant[/red]")
+        print("[yellow]Please install OpenAI: pip install openai[/yellow]") 
+        print("[yellow]And set API key: export OPENAI_API_KEY='your-key'[/yellow]")
+        raise typer.Exit(code=1)
+
+def display_training_results(training_results: list, out_store: str, total_pairs: int, quiet: bool = False):
+    """Display comprehensive training results with file, sheet, and column details.
+
+    With quiet, print a one-line summary instead of building the panel and tables."""
     print()
     print("[bold green]🎉 Enhanced Training Completed Successfully![/bold green]")
     print()
@@ -33,9 +41,23 @@ def display_training_results(training_results: list, out_store: str, total_pairs
         print("[yellow]⚠️  No fillable columns were identified during training.[/yellow]")
         return
     
+    # Group by pair for the detailed table and by sheet for the summary, in one pass
+    by_pair = defaultdict(list)
+    sheet_columns = Counter()
+    sheet_pairs = defaultdict(set)
+    total_columns = 0
+    for result in training_results:
+        by_pair[result["pair"]].append(result)
+        sheet_columns[result["sheet"]] += result["count"]
+        sheet_pairs[result["sheet"]].add(result["pair"])
+        total_columns += result["count"]
+    
     # Summary statistics
-    total_sheets = len(set(result["sheet"] for result in training_results))
-    total_columns = sum(result["count"] for result in training_results)
+    total_sheets = len(sheet_columns)
+    
+    if quiet:
+        print(f"[green]✅ {total_pairs} pairs, {total_sheets} sheets, {total_columns} fillable columns saved to[/green] {out_store}")
+        return
     
     # Create summary panel
     summary_text = f"""[bold]📊 Training Summary:[/bold]
@@ -59,14 +81,6 @@ def display_training_results(training_results: list, out_store: str, total_pairs
     table.add_column("Fillable Column Names", style="white")
     table.add_column("Headers", justify="center", style="blue")
     
-    # Group by pair for better organization
-    by_pair = {}
-    for result in training_results:
-        pair = result["pair"]
-        if pair not in by_pair:
-            by_pair[pair] = []
-        by_pair[pair].append(result)
-    
     for pair_name, pair_results in by_pair.items():
         for i, result in enumerate(pair_results):
             # Only show pair name for the first row of each pair
@@ -91,15 +105,6 @@ def display_training_results(training_results: list, out_store: str, total_pairs
     print(table)
     print()
     
-    # Sheet-wise summary
-    sheet_summary = {}
-    for result in training_results:
-        sheet = result["sheet"]
-        if sheet not in sheet_summary:
-            sheet_summary[sheet] = {"pairs": set(), "total_columns": 0}
-        sheet_summary[sheet]["pairs"].add(result["pair"])
-        sheet_summary[sheet]["total_columns"] += result["count"]
-    
     print("[bold blue]📊 Sheet-wise Learning Summary:[/bold blue]")
     print()
     
@@ -108,11 +113,11 @@ def display_training_results(training_results: list, out_store: str, total_pairs
     summary_table.add_column("Training Pairs", justify="center", style="cyan")
     summary_table.add_column("Total Columns", justify="center", style="green")
     
-    for sheet, data in sorted(sheet_summary.items()):
+    for sheet, columns in sorted(sheet_columns.items()):
         summary_table.add_row(
             sheet,
-            str(len(data["pairs"])),
-            str(data["total_columns"])
+            str(len(sheet_pairs[sheet])),
+            str(columns)
         )
     
     print(summary_table)
@@ -126,15 +131,12 @@ def display_training_results(training_results: list, out_store: str, total_pairs
 def train(data_dir: str = typer.Option(..., help="Folder with training JSON files"),
           out_store: str = typer.Option("patterns_store.json", help="Where to save AI-enhanced patterns"),
           sheet: str = typer.Option(None, help="Specific sheet name to learn (auto-detects all data sheets)"),
-          verbose: bool = typer.Option(False, "--verbose", "-v", help="Show detailed processing information")):
+          verbose: bool = typer.Option(False, "--verbose", "-v", help="Show detailed processing information"),
+          quiet: bool = typer.Option(False, "--quiet", "-q", help="Skip the result tables and print one-line summaries")):
     """AI-Enhanced Training - learns fillable patterns with OpenAI-powered business header detection"""
     
     # Check for OpenAI availability
-    if not ENHANCED_HEADERS_AVAILABLE:
-        print("[red]❌ Error: OpenAI integration required for AI-enhanced Filing Assistant[/red]")
-        print("[yellow]Please install OpenAI: pip install openai[/yellow]") 
-        print("[yellow]And set API key: export OPENAI_API_KEY='your-key'[/yellow]")
-        raise typer.Exit(code=1)
+    _require_enhanced_headers()
     
     print(f"[blue]🚀 Starting AI-Enhanced Training on directory:[/blue] {data_dir}")
     if sheet:
@@ -156,107 +158,177 @@ def train(data_dir: str = typer.Option(..., help="Folder with training JSON file
     print(f"[green]✅ Discovered {len(pairs)} training pairs:[/green]")
     print()
     
-    table = Table(title="📂 Training File Pairs Discovered", box=box.ROUNDED)
-    table.add_column("Pair", justify="center", style="cyan", no_wrap=True)
-    table.add_column("Empty File", style="green")
-    table.add_column("Filled File", style="blue")
-    
-    for i, (empty, filled) in enumerate(pairs, 1):
+    # File and pair display names are derived once and shared by the table and the progress lines
+    pair_meta = []
+    for empty, filled in pairs:
         empty_name = os.path.basename(empty)
-        filled_name = os.path.basename(filled)
-        table.add_row(str(i), empty_name, filled_name)
-    
-    print(table)
-    print()
+        pair_name = empty_name.replace('_structured.json', '').replace(' Empty', '')
+        pair_meta.append((empty_name, os.path.basename(filled), pair_name))
+    
+    if not quiet:
+        table = Table(title="📂 Training File Pairs Discovered", box=box.ROUNDED)
+        table.add_column("Pair", justify="center", style="cyan", no_wrap=True)
+        table.add_column("Empty File", style="green")
+        table.add_column("Filled File", style="blue")
+        
+        for i, (empty_name, filled_name, _) in enumerate(pair_meta, 1):
+            table.add_row(str(i), empty_name, filled_name)
+        
+        print(table)
+        print()
     
     # Enhanced training with detailed results
     print(f"[blue]🧠 Processing {len(pairs)} pairs using Enhanced Training method...[/blue]")
     print()
     
-    store = {"sheets": {}}
     training_results = []
-    
-    for i, (empty, filled) in enumerate(pairs, 1):
-        pair_name = f"{os.path.basename(empty).replace('_structured.json', '').replace(' Empty', '')}"
-        print(f"[dim]🔄 Processing pair {i}/{len(pairs)}: {pair_name}[/dim]")
+    learned_pairs = []
+    
+    # Pairs are learned one at a time: each pair's header detector reads and rewrites the
+    # shared OpenAI decision history, so later pairs must see earlier pairs' decisions.
+    # Results are merged once at the end in pair order, since later pairs overwrite column
+    # positions and verifications. One progress bar tracks the pairs; verbose runs still
+    # label each pair's output
+    with Progress(TextColumn("[dim]🔄 {task.description}[/dim]"), BarColumn(), MofNCompleteColumn(),
+                  TimeElapsedColumn()) as progress:
+        task = progress.add_task("Processing pairs", total=len(pairs))
         
-        try:
-            learned = enhanced_learn_from_pair(empty, filled, sheet, verbose=verbose, use_enhanced_headers=True)
-            store = enhanced_merge_patterns(store, learned)
+        for i, ((empty, filled), (_, _, pair_name)) in enumerate(zip(pairs, pair_meta), 1):
+            progress.update(task, description=pair_name)
+            if verbose:
+                print(f"[dim]🔄 Processing pair {i}/{len(pairs)}: {pair_name}[/dim]")
             
-            # Collect training results for summary
-            for sheet_name, sheet_data in learned.get("sheets", {}).items():
-                fillable_columns = sheet_data.get("columns_to_fill", [])
-                enhanced_headers_used = sheet_data.get("enhanced_headers_used", False)
-                if fillable_columns:
-                    training_results.append({
-                        "pair": pair_name,
-                        "sheet": sheet_name,
-                        "columns": fillable_columns,
-                        "count": len(fillable_columns),
-                        "enhanced_headers": enhanced_headers_used
-                    })
-        except Exception as e:
-            print(f"[red]❌ Error processing pair {i}: {e}[/red]")
-            continue
+            try:
+                learned = enhanced_learn_from_pair(empty, filled, sheet, verbose=verbose, use_enhanced_headers=True)
+                learned_pairs.append(learned)
+                
+                # Collect training results for summary
+                for sheet_name, sheet_data in learned.get("sheets", {}).items():
+                    fillable_columns = sheet_data.get("columns_to_fill", [])
+                    enhanced_headers_used = sheet_data.get("enhanced_headers_used", False)
+                    if fillable_columns:
+                        training_results.append({
+                            "pair": pair_name,
+                            "sheet": sheet_name,
+                            "columns": fillable_columns,
+                            "count": len(fillable_columns),
+                            "enhanced_headers": enhanced_headers_used
+                        })
+            except Exception as e:
+                print(f"[red]❌ Error processing pair {i} ({pair_name}): {e}[/red]")
+            progress.advance(task)
+        progress.update(task, description="Processing pairs")
+    
+    store = enhanced_merge_patterns({"sheets": {}}, *learned_pairs)
     
     # Save results
     save_store(out_store, store)
     
     # Display comprehensive training results
-    display_training_results(training_results, out_store, len(pairs))
+    display_training_results(training_results, out_store, len(pairs), quiet=quiet)
 
-@app.command()
-def identify(file: str = typer.Option(..., help="New empty JSON file"),
-             store: str = typer.Option("patterns_store.json", help="AI-enhanced patterns store"),
-             sheet: str = typer.Option(None, help="Sheet name to identify (auto-detect if not specified)"),
-             out: str = typer.Option(None, help="Optional path to write JSON result"),
-             threshold: float = typer.Option(0.7, help="Confidence threshold for auto-accept mapping"),
-             verbose: bool = typer.Option(False, help="Show detailed processing information")):
-    """AI-Enhanced Identification - identifies fillable columns with cross-sheet pattern analysis and OpenAI headers"""
-    
-    # Check for OpenAI availability
-    if not ENHANCED_HEADERS_AVAILABLE:
-        print("[red]❌ Error: OpenAI integration required for AI-enhanced Filing Assistant[/red]")
-        print("[yellow]Please install OpenAI: pip install openai[/yellow]") 
-        print("[yellow]And set API key: export OPENAI_API_KEY='your-key'[/yellow]")
-        raise typer.Exit(code=1)
-    
-    st = load_store(store)
-    
-    if verbose:
-        print(f"[bold blue]🔍 AI-Enhanced Identification for:[/bold blue] {file}")
-        if sheet:
-            print(f"[dim]📋 Target sheet: {sheet}[/dim]")
-        else:
-            print(f"[dim]📋 Auto-detecting all sheets[/dim]")
-        print(f"[dim]📊 Confidence threshold: {threshold}[/dim]")
-        print(f"[dim]🤖 Enhanced header detection: ENABLED[/dim]")
-        print(f"[dim]🔄 Cross-sheet pattern analysis: ENABLED[/dim]")
-        print()
-    
-    # Always use cross-sheet analysis with enhanced headers
+def identify_file(file_path: str, store: dict, enhanced_headers: bool = True, sheet: str = None,
+                  threshold: float = 0.7) -> dict:
+    """Run cross-sheet identification on one file against an already-loaded store.
+
+    Returns the same structure the `identify` command displays and writes with --out,
+    so callers evaluating many files can load the store once and skip the CLI entirely."""
     from .cross_sheet_analyzer import cross_sheet_identify_required_columns
-    result = cross_sheet_identify_required_columns(file, st, sheet, threshold, True)
-    is_cross_sheet = True
-    
-    # Handle cross-sheet results format
-    if is_cross_sheet and "primary_results" in result:
-        primary_sheet = result.get("primary_sheet")
-        primary_results = result.get("primary_results", {})
-        
-        if verbose and primary_sheet:
-            patterns_analyzed = result.get("summary", {}).get("patterns_analyzed", 0)
-            print(f"[green]🔄 Cross-sheet analysis completed:[/green] Analyzed {patterns_analyzed} pattern sources")
-            print(f"[green]✨ Best sheet identified:[/green] {primary_sheet}")
-        
-        # Convert to standard format for display
+    result = cross_sheet_identify_required_columns(file_path, store, sheet, threshold, enhanced_headers)
+
+    # Convert cross-sheet results to the standard per-sheet format
+    if "primary_results" in result:
         result = {
-            "sheets": {primary_sheet: primary_results},
+            "sheets": {result.get("primary_sheet"): result.get("primary_results", {})},
             "summary": result.get("summary", {}),
             "cross_sheet_analysis": True
         }
-    
+    return result
+
+# identify results are memoized on disk per (file, store, sheet, threshold, detector state);
+# bump the version when identification logic changes so stale results are not reused
+IDENTIFY_CACHE_DIR = ".identify_cache"
+IDENTIFY_CACHE_VERSION = 2
+
+def _detector_state() -> list:
+    """Key parts for the detector's own inputs: its decision history, response cache and OpenAI use."""
+    from .enhanced_header_detector import DECISION_HISTORY_FILE, OPENAI_CACHE_DIR, OPENAI_AVAILABLE
+    parts = [str(OPENAI_AVAILABLE and bool(os.getenv("OPENAI_API_KEY")))]
+    for path in (DECISION_HISTORY_FILE, OPENAI_CACHE_DIR):
+        try:
+            st = os.stat(path)
+            parts += [str(st.st_mtime_ns), str(st.st_size)]
+        except OSError:
+            parts.append("-")
+    return parts
+
+def _identify_cache_path(file_path: str, store_path: str, sheet: str, threshold: float) -> str:
+    """Cache file for one identify call, keyed on both files' paths, mtimes and sizes and the detector state."""
+    parts = [str(IDENTIFY_CACHE_VERSION), str(sheet), repr(threshold)] + _detector_state()
+    for path in (file_path, store_path):
+        st = os.stat(path)
+        parts += [os.path.abspath(path), str(st.st_mtime_ns), str(st.st_size)]
+    key = hashlib.blake2b("|".join(parts).encode("utf-8"), digest_size=20).hexdigest()
+    return os.path.join(IDENTIFY_CACHE_DIR, f"{key}.bin")
+
+def identify_file_cached(file_path: str, store: dict, store_path: str, sheet: str = None,
+                         threshold: float = 0.7) -> dict:
+    """identify_file, reusing the result of an earlier identical run when none of its inputs changed.
+
+    Results are stored with marshal so tuples and non-str keys come back exactly as computed."""
+    try:
+        cache_path = _identify_cache_path(file_path, store_path, sheet, threshold)
+    except OSError:
+        return identify_file(file_path, store, enhanced_headers=True, sheet=sheet, threshold=threshold)
+    try:
+        with open(cache_path, "rb") as f:
+            return marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    result = identify_file(file_path, store, enhanced_headers=True, sheet=sheet, threshold=threshold)
+    if "error" not in result:
+        # Unique temp name, then an atomic rename
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            data = marshal.dumps(result)
+            os.makedirs(IDENTIFY_CACHE_DIR, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, cache_path)
+        except (OSError, ValueError) as e:
+            print(f"[yellow]⚠️  Could not cache identify result: {e}[/yellow]")
+    return result
+
+# (header, justify) for every identify result table
+_IDENTIFY_COLUMNS = (
+    ("Pos", "right"), ("Header", "left"), ("Label", "left"), ("Conf", "right"),
+    ("Method", "left"), ("Decision", "left"), ("Enhanced", "center"), ("Sources", "center"),
+)
+
+def _identify_table(title: str) -> Table:
+    """Empty identify result table with the standard columns."""
+    tbl = Table(title=title, box=box.SIMPLE_HEAVY)
+    for header, justify in _IDENTIFY_COLUMNS:
+        tbl.add_column(header, justify=justify)
+    return tbl
+
+def _identify_row(r: dict, dim: bool = False) -> list:
+    """Table cells for one identified column; unknown columns are shown dimmed."""
+    method_color = "dim" if dim else ("green" if r.get("learned_fillable") else "blue")
+    
+    # Always show enhanced headers indicator and source patterns count
+    source_patterns = r.get("source_patterns")
+    cells = [r["decision"], "🤖" if r.get("enhanced_header") else "📊",
+             f"🔄{len(source_patterns)}" if source_patterns else "📋1"]
+    if dim:
+        cells = [f"[dim]{c}[/dim]" for c in cells]
+    return [str(r["position"]), r["header"], r["label"], f"{r['confidence']:.2f}",
+            f"[{method_color}]{r['verified_by']}[/{method_color}]", *cells]
+
+def _print_identify_result(result: dict, verbose: bool, out: str = None, quiet: bool = False) -> None:
+    """Print identify's per-sheet tables and summary, and write the result to out if given.
+
+    With quiet, each sheet gets a one-line count instead of its tables."""
     # Handle error cases
     if "error" in result:
         print(f"[red]❌ Error:[/red] {result['error']}")
@@ -277,75 +349,21 @@ def identify(file: str = typer.Option(..., help="New empty JSON file"),
         if enhancement_info.get("enhanced"):
             enhancement_confidence = enhancement_info.get("confidence", 0)
             print(f"[green]🤖 Enhanced Headers Used:[/green] {sheet_name} (Confidence: {enhancement_confidence:.1%})")
-            
-        tbl = Table(title=f"Columns to Fill — {sheet_name}", box=box.SIMPLE_HEAVY)
-        tbl.add_column("Pos", justify="right")
-        tbl.add_column("Header")
-        tbl.add_column("Label")
-        tbl.add_column("Conf", justify="right")
-        tbl.add_column("Method")
-        tbl.add_column("Decision")
-        tbl.add_column("Enhanced", justify="center")
-        tbl.add_column("Sources", justify="center")
         
-        # Add fillable columns
-        for r in sheet_data.get("columns", []):
-            method_color = "green" if r.get("learned_fillable") else "blue"
-            method_text = f"[{method_color}]{r['verified_by']}[/{method_color}]"
-            
-            row_data = [
-                str(r["position"]), 
-                r["header"], 
-                r["label"], 
-                f"{r['confidence']:.2f}",
-                method_text,
-                r["decision"]
-            ]
-            
-            # Always show enhanced headers indicator
-            enhanced_marker = "🤖" if r.get("enhanced_header") else "📊"
-            row_data.append(enhanced_marker)
-            
-            # Always show source patterns count
-            source_patterns = r.get("source_patterns", [])
-            if source_patterns:
-                source_indicator = f"🔄{len(source_patterns)}"
-            else:
-                source_indicator = "📋1"
-            row_data.append(source_indicator)
+        if quiet:
+            print(f"[bold]{sheet_name}:[/bold] {len(sheet_data.get('columns', []))} fillable, "
+                  f"{len(sheet_data.get('unknowns', []))} unknown")
+            continue
             
-            tbl.add_row(*row_data)
+        tbl = _identify_table(f"Columns to Fill — {sheet_name}")
+        for r in sheet_data.get("columns", []):
+            tbl.add_row(*_identify_row(r))
         
         # Add unknown columns if any
         if sheet_data.get("unknowns"):
             tbl.add_section()
             for r in sheet_data.get("unknowns", []):
-                method_color = "dim" if r.get("learned_fillable") else "dim"
-                method_text = f"[{method_color}]{r['verified_by']}[/{method_color}]"
-                
-                row_data = [
-                    str(r["position"]), 
-                    r["header"], 
-                    r["label"], 
-                    f"{r['confidence']:.2f}",
-                    method_text,
-                    f"[dim]{r['decision']}[/dim]"
-                ]
-                
-                # Always show enhanced headers indicator
-                enhanced_marker = "🤖" if r.get("enhanced_header") else "📊"
-                row_data.append(f"[dim]{enhanced_marker}[/dim]")
-                
-                # Always show source patterns count
-                source_patterns = r.get("source_patterns", [])
-                if source_patterns:
-                    source_indicator = f"🔄{len(source_patterns)}"
-                else:
-                    source_indicator = "📋1"
-                row_data.append(f"[dim]{source_indicator}[/dim]")
-                
-                tbl.add_row(*row_data)
-        
+                tbl.add_row(*_identify_row(r, dim=True))
         print(tbl)
         
         if verbose:
@@ -377,24 +395,130 @@ def identify(file: str = typer.Option(..., help="New empty JSON file"),
             print(f"  [bold dim]Enhanced headers:[/bold dim] Standard 📊")
     
     if out:
-        with open(out, "w", encoding="utf-8") as f:
-            json.dump(result, f, indent=2, ensure_ascii=False)
+        write_json(out, result)
         print(f"[green]✅ Wrote identify result to[/green] {out}")
 
+@app.command()
+def identify(file: str = typer.Option(None, help="New empty JSON file"),
+             store: str = typer.Option("patterns_store.json", help="AI-enhanced patterns store"),
+             sheet: str = typer.Option(None, help="Sheet name to identify (auto-detect if not specified)"),
+             out: str = typer.Option(None, help="Optional path to write JSON result"),
+             threshold: float = typer.Option(0.7, help="Confidence threshold for auto-accept mapping"),
+             verbose: bool = typer.Option(False, help="Show detailed processing information"),
+             files_from: str = typer.Option(None, help="Text file listing one JSON file per line to identify in a single run"),
+             json_out: bool = typer.Option(False, help="Print results as JSON to stdout instead of tables"),
+             quiet: bool = typer.Option(False, "--quiet", "-q", help="Print one line per sheet instead of tables"),
+             cache: bool = typer.Option(False, "--cache", help="Reuse results of earlier identical runs from .identify_cache")):
+    """AI-Enhanced Identification - identifies fillable columns with cross-sheet pattern analysis and OpenAI headers"""
+    
+    # Check for OpenAI availability
+    _require_enhanced_headers()
+    
+    if not file and not files_from:
+        print("[red]❌ Error: provide --file or --files-from[/red]")
+        raise typer.Exit(code=1)
+    if file and files_from:
+        raise typer.BadParameter("use either --file or --files-from, not both")
+    
+    # identify only reads the store, so it can share an already-parsed copy
+    st = load_store_cached(store)
+    
+    def run(path: str) -> dict:
+        if cache:
+            return identify_file_cached(path, st, store, sheet=sheet, threshold=threshold)
+        return identify_file(path, st, enhanced_headers=True, sheet=sheet, threshold=threshold)
+    
+    # Batch mode: one process and one store load for many files, results as a JSON array
+    if files_from:
+        with open(files_from, "r", encoding="utf-8") as f:
+            paths = [line.strip() for line in f if line.strip()]
+        # Detector progress messages go to stderr so stdout carries only the JSON
+        results = []
+        with contextlib.redirect_stdout(sys.stderr):
+            for path in paths:
+                # One bad file is recorded in the output instead of aborting the batch
+                try:
+                    results.append({"file": path, **run(path)})
+                except Exception as e:
+                    results.append({"file": path, "error": str(e)})
+        typer.echo(json.dumps(results, ensure_ascii=False))
+        if out:
+            write_json(out, results)
+        failed = sum("error" in r for r in results)
+        if failed:
+            print(f"[red]❌ {failed} of {len(results)} files failed[/red]", file=sys.stderr)
+            raise typer.Exit(code=1)
+        return
+    
+    if verbose:
+        print(f"[bold blue]🔍 AI-Enhanced Identification for:[/bold blue] {file}")
+        if sheet:
+            print(f"[dim]📋 Target sheet: {sheet}[/dim]")
+        else:
+            print(f"[dim]📋 Auto-detecting all sheets[/dim]")
+        print(f"[dim]📊 Confidence threshold: {threshold}[/dim]")
+        print(f"[dim]🤖 Enhanced header detection: ENABLED[/dim]")
+        print(f"[dim]🔄 Cross-sheet pattern analysis: ENABLED[/dim]")
+        print()
+    
+    # Always use cross-sheet analysis with enhanced headers
+    with contextlib.redirect_stdout(sys.stderr) if json_out else contextlib.nullcontext():
+        result = run(file)
+
+    primary_sheet = result.get("summary", {}).get("best_sheet")
+    if verbose and result.get("cross_sheet_analysis") and primary_sheet:
+        patterns_analyzed = result.get("summary", {}).get("patterns_analyzed", 0)
+        print(f"[green]🔄 Cross-sheet analysis completed:[/green] Analyzed {patterns_analyzed} pattern sources")
+        print(f"[green]✨ Best sheet identified:[/green] {primary_sheet}")
+
+    if json_out:
+        typer.echo(json.dumps(result, ensure_ascii=False))
+        if out:
+            write_json(out, result)
+        return
+    
+    # Rich renders everything printed inside this block and writes it out once at the end
+    with get_console():
+        _print_identify_result(result, verbose, out, quiet=quiet)
+
+@app.command()
+def serve(store: str = typer.Option("patterns_store.json", help="AI-enhanced patterns store")):
+    """Answer identify requests as JSON lines on stdin/stdout, loading the store once.
+
+    Each request line is {"file": ..., "sheet": ..., "threshold": ..., "enhanced": ...};
+    only "file" is required. Each reply line is the identify result, or {"error": ...}."""
+    st = load_store(store)
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            req = json.loads(line)
+            # Detector progress messages go to stderr so stdout carries only replies
+            with contextlib.redirect_stdout(sys.stderr):
+                result = identify_file(req["file"], st, enhanced_headers=req.get("enhanced", True),
+                                       sheet=req.get("sheet"), threshold=req.get("threshold", 0.7))
+        except Exception as e:
+            result = {"error": str(e)}
+        sys.stdout.write(json.dumps(result, ensure_ascii=False) + "\n")
+        sys.stdout.flush()
+
 @app.command()
 def update(store: str = typer.Option(..., help="Patterns store to update"),
            user_labels: str = typer.Option(..., help="JSON file with user-provided column_labels by sheet")):
     st = load_store(store)
-    with open(user_labels, "r", encoding="utf-8") as f:
-        upd = json.load(f)
+    upd = read_json(user_labels)
     for sheet, payload in upd.items():
         target = st.setdefault("sheets", {}).setdefault(sheet, {"header_map": {}, "columns_to_fill": [], "column_positions": {}, "verifications": {}})
         labels = payload.get("column_labels", {})
-        for raw, norm in labels.items():
+        # Shadow set so membership checks stay O(1) while columns_to_fill keeps its order
+        fill_set = set(target["columns_to_fill"])
+        for raw in labels:
             target["header_map"].setdefault(raw, [])
-            if raw not in target["columns_to_fill"]:
+            if raw not in fill_set:
+                fill_set.add(raw)
                 target["columns_to_fill"].append(raw)
-            target["verifications"][raw] = {"label": norm, "confidence": 1.0, "method": "user"}
+        target["verifications"].update(
+            {raw: {"label": norm, "confidence": 1.0, "method": "user"} for raw, norm in labels.items()})
     save_store(store, st)
     print(f"[green]Updated patterns store[/green] {store}")
 
@@ -6,9 +6,13 @@ This module implements a 5-strategy header detection system with OpenAI API
 as the final judge to validate and improve header mappings over time.
 """
 
+import hashlib
+import importlib.util
 import json
 import re
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Tuple, Optional, Any
 from collections import Counter
 import statistics
@@ -19,12 +23,132 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
+# The openai package is slow to import, so only check it is installed here and
+# import it when a detector actually builds a client
+OPENAI_AVAILABLE = importlib.util.find_spec("openai") is not None
+
 try:
-    from openai import OpenAI
-    OPENAI_AVAILABLE = True
+    from blake3 import blake3 as _request_hasher
 except ImportError:
-    OPENAI_AVAILABLE = False
-    OpenAI = None
+    _request_hasher = hashlib.sha256
+
+# Where OpenAI decisions are recorded for historical learning
+DECISION_HISTORY_FILE = "openai_header_decisions.json"
+
+# Model used for header validation; part of every response cache key
+OPENAI_MODEL = "gpt-4"
+OPENAI_CACHE_DIR = ".openai_cache"
+
+class _OpenAICache:
+    """On-disk cache of OpenAI responses keyed by a hash of the canonical request."""
+    
+    def __init__(self, cache_dir: str = OPENAI_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+    
+    def key(self, request: Dict[str, Any]) -> str:
+        canonical = json.dumps(request, sort_keys=True, separators=(",", ":"))
+        return _request_hasher(canonical.encode("utf-8")).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        try:
+            with open(self.cache_dir / f"{key}.json", 'r') as f:
+                return json.load(f)["content"]
+        except (OSError, ValueError, KeyError):
+            return None
+    
+    def put(self, key: str, content: str):
+        path = self.cache_dir / f"{key}.json"
+        # Unique temp name per thread, then an atomic rename
+        tmp_path = path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump({"content": content}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️  Could not cache OpenAI response: {e}")
+
+def read_decision_history(history_file: str = DECISION_HISTORY_FILE) -> Dict[str, Any]:
+    """Load previous OpenAI decisions, or an empty history if none exist."""
+    if os.path.exists(history_file):
+        try:
+            with open(history_file, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"⚠️  Could not load decision history: {e}")
+    
+    return {
+        "metadata": {
+            "created": datetime.now().isoformat(),
+            "total_decisions": 0,
+            "accuracy_feedback": {}
+        },
+        "decisions": {},
+        "learning_patterns": {}
+    }
+
+def write_decision_history(history: Dict[str, Any], history_file: str = DECISION_HISTORY_FILE):
+    """Save the decision history through a temp file and a rename, so a reader never
+    sees a half-written file."""
+    tmp_path = f"{history_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(history, f, indent=2)
+        os.replace(tmp_path, history_file)
+    except Exception as e:
+        print(f"⚠️  Could not save decision history: {e}")
+
+def update_learning_patterns(history: Dict[str, Any], ai_result: Dict[str, Any]):
+    """Update a history's learning patterns based on one OpenAI decision."""
+    learning_patterns = history.setdefault("learning_patterns", {})
+    # A new history starts with empty learning_patterns, so fill in each list
+    learning_patterns.setdefault("positive_indicators", [])
+    learning_patterns.setdefault("negative_indicators", [])
+    learning_patterns.setdefault("common_mappings", {})
+    
+    validated_mapping = ai_result.get("validated_mapping", {})
+    
+    # Extract positive patterns from validated headers
+    for col, header in validated_mapping.items():
+        if header and len(header) > 2:
+            # Add header components as positive indicators
+            header_parts = header.replace('_', ' ').split()
+            for part in header_parts:
+                if len(part) > 2 and part not in learning_patterns["positive_indicators"]:
+                    learning_patterns["positive_indicators"].append(part)
+    
+    # Limit pattern lists to prevent memory bloat
+    learning_patterns["positive_indicators"] = learning_patterns["positive_indicators"][-100:]
+    learning_patterns["negative_indicators"] = learning_patterns["negative_indicators"][-50:]
+
+# Worker processes must not rewrite DECISION_HISTORY_FILE concurrently. After
+# defer_decision_history(), decisions are queued in memory instead; the parent collects
+# them with take_pending_decisions() and saves them once with merge_decision_history().
+_DEFER_HISTORY = False
+_pending_decisions: List[Tuple[str, Dict[str, Any]]] = []
+
+def defer_decision_history():
+    """Queue this process's decisions in memory instead of writing the history file."""
+    global _DEFER_HISTORY
+    _DEFER_HISTORY = True
+
+def take_pending_decisions() -> List[Tuple[str, Dict[str, Any]]]:
+    """Return and clear the (decision_id, record) pairs queued since the last call."""
+    pending = _pending_decisions[:]
+    del _pending_decisions[:len(pending)]
+    return pending
+
+def merge_decision_history(pending: List[Tuple[str, Dict[str, Any]]],
+                           history_file: str = DECISION_HISTORY_FILE):
+    """Add decisions collected from worker processes to the history file in one write."""
+    if not pending:
+        return
+    history = read_decision_history(history_file)
+    for decision_id, record in pending:
+        history["decisions"][decision_id] = record
+        history["metadata"]["total_decisions"] += 1
+        update_learning_patterns(history, record["ai_result"])
+    write_decision_history(history, history_file)
 
 class EnhancedHeaderDetector:
     """
@@ -41,6 +165,7 @@ class EnhancedHeaderDetector:
         # Initialize OpenAI client with better error handling
         if OPENAI_AVAILABLE and self.openai_api_key:
             try:
+                from openai import OpenAI
                 self.openai_client = OpenAI(api_key=self.openai_api_key)
                 print("✅ OpenAI client initialized successfully!")
             except Exception as e:
@@ -94,55 +219,53 @@ class EnhancedHeaderDetector:
         
         # Load historical decisions for learning
         self.decision_history = self.load_decision_history()
+        # Batched validation records decisions from several threads
+        self._history_lock = threading.Lock()
+        
+        # Identical requests are answered from disk instead of the API
+        self.response_cache = _OpenAICache()
     
     def load_decision_history(self) -> Dict[str, Any]:
         """Load previous OpenAI decisions for learning."""
-        history_file = "openai_header_decisions.json"
-        if os.path.exists(history_file):
-            try:
-                with open(history_file, 'r') as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"⚠️  Could not load decision history: {e}")
-        
-        return {
-            "metadata": {
-                "created": datetime.now().isoformat(),
-                "total_decisions": 0,
-                "accuracy_feedback": {}
-            },
-            "decisions": {},
-            "learning_patterns": {}
-        }
+        return read_decision_history()
     
     def save_decision_history(self):
         """Save decision history for future learning."""
-        history_file = "openai_header_decisions.json"
-        try:
-            with open(history_file, 'w') as f:
-                json.dump(self.decision_history, f, indent=2)
-        except Exception as e:
-            print(f"⚠️  Could not save decision history: {e}")
+        write_decision_history(self.decision_history)
     
-    def strategy_1_pattern_based(self, sheet_data: Dict[str, Any]) -> List[Tuple[int, float, Dict[str, Any]]]:
-        """Strategy 1: Pattern-based detection using business keywords."""
+    def scan_rows(self, sheet_data: Dict[str, Any]) -> List[Tuple[int, List[str]]]:
+        """Extract the non-empty cell values of the first 50 rows, once per sheet.
+        
+        Rows with fewer than 3 values cannot be headers and are skipped. Strategies 1-4
+        all work from this list, so collect_candidates computes it once and shares it."""
         column_count = len(sheet_data.get('columns', []))
         data_rows = sheet_data.get('data', [])
-        candidates = []
+        col_keys = [f'col_{i}' for i in range(column_count)]
+        rows = []
         
         for row_idx in range(min(50, len(data_rows))):
             row = data_rows[row_idx]
-            score = 0.0
-            analysis = {'strategy': 'pattern_based', 'details': {}}
-            
             values = []
-            for i in range(column_count):
-                val = str(row.get(f'col_{i}', '')).strip()
+            for key in col_keys:
+                val = str(row.get(key, '')).strip()
                 if val and val.lower() != 'nan':
                     values.append(val)
             
-            if len(values) < 3:
-                continue
+            if len(values) >= 3:
+                rows.append((row_idx, values))
+        
+        return rows
+    
+    def strategy_1_pattern_based(self, sheet_data: Dict[str, Any],
+                                 rows: Optional[List[Tuple[int, List[str]]]] = None) -> List[Tuple[int, float, Dict[str, Any]]]:
+        """Strategy 1: Pattern-based detection using business keywords."""
+        if rows is None:
+            rows = self.scan_rows(sheet_data)
+        candidates = []
+        
+        for row_idx, values in rows:
+            score = 0.0
+            analysis = {'strategy': 'pattern_based', 'details': {}}
             
             # Check for business keywords
             keyword_matches = 0
@@ -162,26 +285,18 @@ class EnhancedHeaderDetector:
         
         return sorted(candidates, key=lambda x: x[1], reverse=True)
     
-    def strategy_2_structural_analysis(self, sheet_data: Dict[str, Any]) -> List[Tuple[int, float, Dict[str, Any]]]:
+    def strategy_2_structural_analysis(self, sheet_data: Dict[str, Any],
+                                       rows: Optional[List[Tuple[int, List[str]]]] = None) -> List[Tuple[int, float, Dict[str, Any]]]:
         """Strategy 2: Structural analysis of data patterns."""
         column_count = len(sheet_data.get('columns', []))
-        data_rows = sheet_data.get('data', [])
+        if rows is None:
+            rows = self.scan_rows(sheet_data)
         candidates = []
         
-        for row_idx in range(min(50, len(data_rows))):
-            row = data_rows[row_idx]
+        for row_idx, values in rows:
             score = 0.0
             analysis = {'strategy': 'structural', 'details': {}}
             
-            values = []
-            for i in range(column_count):
-                val = str(row.get(f'col_{i}', '')).strip()
-                if val and val.lower() != 'nan':
-                    values.append(val)
-            
-            if len(values) < 3:
-                continue
-            
             # Coverage score
             coverage = len(values) / column_count
             score += coverage * 30
@@ -211,33 +326,24 @@ class EnhancedHeaderDetector:
         
         return sorted(candidates, key=lambda x: x[1], reverse=True)
     
-    def strategy_3_template_pattern(self, sheet_data: Dict[str, Any]) -> List[Tuple[int, float, Dict[str, Any]]]:
+    def strategy_3_template_pattern(self, sheet_data: Dict[str, Any],
+                                    rows: Optional[List[Tuple[int, List[str]]]] = None) -> List[Tuple[int, float, Dict[str, Any]]]:
         """Strategy 3: Template pattern recognition."""
-        column_count = len(sheet_data.get('columns', []))
-        data_rows = sheet_data.get('data', [])
+        if rows is None:
+            rows = self.scan_rows(sheet_data)
         candidates = []
         
-        for row_idx in range(min(50, len(data_rows))):
-            row = data_rows[row_idx]
+        for row_idx, values in rows:
             score = 0.0
             analysis = {'strategy': 'template_pattern', 'details': {}}
             
-            values = []
+            # Check for template patterns
             template_matches = 0
-            
-            for i in range(column_count):
-                val = str(row.get(f'col_{i}', '')).strip()
-                if val and val.lower() != 'nan':
-                    values.append(val)
-                    
-                    # Check for template patterns
-                    for pattern in self.template_patterns:
-                        if re.search(pattern, val):
-                            template_matches += 1
-                            break
-            
-            if len(values) < 3:
-                continue
+            for val in values:
+                for pattern in self.template_patterns:
+                    if re.search(pattern, val):
+                        template_matches += 1
+                        break
             
             template_ratio = template_matches / len(values)
             score = template_ratio * 50  # High weight for template patterns
@@ -253,10 +359,11 @@ class EnhancedHeaderDetector:
         
         return sorted(candidates, key=lambda x: x[1], reverse=True)
     
-    def strategy_4_historical_learning(self, sheet_data: Dict[str, Any], file_name: str) -> List[Tuple[int, float, Dict[str, Any]]]:
+    def strategy_4_historical_learning(self, sheet_data: Dict[str, Any], file_name: str,
+                                       rows: Optional[List[Tuple[int, List[str]]]] = None) -> List[Tuple[int, float, Dict[str, Any]]]:
         """Strategy 4: Learn from historical OpenAI decisions."""
-        column_count = len(sheet_data.get('columns', []))
-        data_rows = sheet_data.get('data', [])
+        if rows is None:
+            rows = self.scan_rows(sheet_data)
         candidates = []
         
         # Extract patterns from decision history with safe defaults
@@ -272,34 +379,28 @@ class EnhancedHeaderDetector:
         if 'negative_indicators' not in learning_patterns:
             learning_patterns['negative_indicators'] = []
         
-        for row_idx in range(min(50, len(data_rows))):
-            row = data_rows[row_idx]
+        # Lower-case the learned patterns once rather than per value
+        positive_patterns = [p.lower() for p in learning_patterns.get('positive_indicators', [])]
+        negative_patterns = [p.lower() for p in learning_patterns.get('negative_indicators', [])]
+        
+        for row_idx, values in rows:
             score = 0.0
             analysis = {'strategy': 'historical_learning', 'details': {}}
             
-            values = []
-            for i in range(column_count):
-                val = str(row.get(f'col_{i}', '')).strip()
-                if val and val.lower() != 'nan':
-                    values.append(val)
-            
-            if len(values) < 3:
-                continue
-            
             # Apply learned patterns
             pattern_matches = 0
             for value in values:
-                value_clean = self.clean_header_name(value)
+                value_clean = self.clean_header_name(value).lower()
                 
                 # Check against learned positive patterns
-                for pattern in learning_patterns.get('positive_indicators', []):
-                    if pattern.lower() in value_clean.lower():
+                for pattern in positive_patterns:
+                    if pattern in value_clean:
                         pattern_matches += 1
                         break
                 
                 # Check against learned negative patterns
-                for pattern in learning_patterns.get('negative_indicators', []):
-                    if pattern.lower() in value_clean.lower():
+                for pattern in negative_patterns:
+                    if pattern in value_clean:
                         pattern_matches -= 0.5  # Penalty for negative patterns
             
             if pattern_matches > 0:
@@ -326,8 +427,7 @@ class EnhancedHeaderDetector:
         context = self.prepare_openai_context(sheet_data, file_name, candidate_mappings)
         
         try:
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4",
+            content, from_cache = self.chat_completion(
                 messages=[
                     {
                         "role": "system",
@@ -357,10 +457,11 @@ class EnhancedHeaderDetector:
             )
             
             # Parse OpenAI response
-            ai_result = self.parse_openai_response(response.choices[0].message.content)
+            ai_result = self.parse_openai_response(content)
             
-            # Record decision for learning
-            self.record_openai_decision(file_name, context, ai_result)
+            # Record decision for learning (cached answers were recorded when first made)
+            if not from_cache:
+                self.record_openai_decision(file_name, context, ai_result)
             
             return ai_result
             
@@ -368,6 +469,104 @@ class EnhancedHeaderDetector:
             print(f"❌ OpenAI API error: {e}")
             return {"validated_mapping": {}, "confidence": 0.0, "reasoning": f"API Error: {e}"}
     
+    def strategy_5_openai_validation_batch(self, sheets: Dict[str, Tuple[Dict[str, Any], List[Dict[str, Any]]]],
+                                           file_name: str) -> Dict[str, Dict[str, Any]]:
+        """Strategy 5 for several sheets in a single OpenAI request.
+        
+        `sheets` maps sheet name -> (sheet_data, candidate_mappings). Returns a result per sheet
+        in the same format as strategy_5_openai_validation."""
+        
+        if not self.openai_client:
+            print("⚠️  OpenAI client not available, skipping AI validation")
+            return {name: {"validated_mapping": {}, "confidence": 0.0, "reasoning": "No OpenAI client"}
+                    for name in sheets}
+        
+        # One clearly delimited section per sheet
+        contexts = {
+            name: self.prepare_openai_context(sheet_data, file_name, candidates)
+            for name, (sheet_data, candidates) in sheets.items()
+        }
+        combined_context = "\n".join(
+            f"===== SHEET: {name} =====\n{context}" for name, context in contexts.items()
+        )
+        
+        try:
+            content, from_cache = self.chat_completion(
+                messages=[
+                    {
+                        "role": "system",
+                        "content": """You are an expert data analyst specializing in business document header detection. 
+                        Your task is to evaluate proposed header mappings for several sheets of one spreadsheet
+                        and provide the best possible mapping for each sheet. Sheets are delimited by
+                        "===== SHEET: <name> =====" lines.
+                        
+                        Focus on:
+                        1. Business logic and semantic meaning
+                        2. Consistency with logistics/financial domain
+                        3. Header naming conventions
+                        4. Data type alignment
+                        
+                        Respond with a single JSON object keyed by the exact sheet name. Each value contains:
+                        - validated_mapping: {col_X: cleaned_header_name}
+                        - confidence: float (0.0-1.0)
+                        - reasoning: string explaining your decisions
+                        - improvements: list of suggested improvements
+                        """
+                    },
+                    {
+                        "role": "user",
+                        "content": combined_context
+                    }
+                ],
+                temperature=0.1,  # Low temperature for consistent results
+                max_tokens=4000
+            )
+            
+            batch_result = self.parse_openai_response(content)
+        
+        except Exception as e:
+            print(f"❌ OpenAI API error: {e}")
+            return {name: {"validated_mapping": {}, "confidence": 0.0, "reasoning": f"API Error: {e}"}
+                    for name in sheets}
+        
+        results = {}
+        for name, context in contexts.items():
+            ai_result = batch_result.get(name)
+            if not isinstance(ai_result, dict):
+                ai_result = {
+                    "validated_mapping": {},
+                    "confidence": 0.0,
+                    "reasoning": "Sheet missing from batched OpenAI response",
+                    "improvements": []
+                }
+            elif not from_cache:
+                # Record decision for learning, one entry per sheet as in the single-sheet path
+                self.record_openai_decision(f"{file_name}:{name}", context, ai_result)
+            results[name] = ai_result
+        
+        return results
+    
+    def chat_completion(self, messages: List[Dict[str, str]], temperature: float,
+                        max_tokens: int) -> Tuple[str, bool]:
+        """Send a chat completion request, answering from the response cache when possible.
+        
+        Returns (response_text, from_cache)."""
+        request = {
+            "model": OPENAI_MODEL,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        key = self.response_cache.key(request)
+        cached = self.response_cache.get(key)
+        if cached is not None:
+            return cached, True
+        
+        response = self.openai_client.chat.completions.create(**request)
+        content = response.choices[0].message.content
+        self.response_cache.put(key, content)
+        return content, False
+    
     def prepare_openai_context(self, sheet_data: Dict[str, Any], file_name: str, 
                               candidates: List[Dict[str, Any]]) -> str:
         """Prepare context for OpenAI analysis."""
@@ -445,7 +644,7 @@ Please provide your analysis in JSON format.
         """Record OpenAI decision for future learning."""
         decision_id = f"{file_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         
-        self.decision_history["decisions"][decision_id] = {
+        record = {
             "timestamp": datetime.now().isoformat(),
             "file_name": file_name,
             "context": context[:1000],  # Truncate for storage
@@ -453,54 +652,42 @@ Please provide your analysis in JSON format.
             "confidence": ai_result.get("confidence", 0.0)
         }
         
-        self.decision_history["metadata"]["total_decisions"] += 1
-        
-        # Extract learning patterns
-        self.update_learning_patterns(ai_result)
-        
-        # Save updated history
-        self.save_decision_history()
+        with self._history_lock:
+            self.decision_history["decisions"][decision_id] = record
+            
+            self.decision_history["metadata"]["total_decisions"] += 1
+            
+            # Extract learning patterns
+            self.update_learning_patterns(ai_result)
+            
+            # Save updated history, or leave it to the parent process in a worker
+            if _DEFER_HISTORY:
+                _pending_decisions.append((decision_id, record))
+            else:
+                self.save_decision_history()
     
     def update_learning_patterns(self, ai_result: Dict[str, Any]):
         """Update learning patterns based on OpenAI decisions."""
-        learning_patterns = self.decision_history.setdefault("learning_patterns", {
-            "positive_indicators": [],
-            "negative_indicators": [],
-            "common_mappings": {}
-        })
-        
-        validated_mapping = ai_result.get("validated_mapping", {})
-        
-        # Extract positive patterns from validated headers
-        for col, header in validated_mapping.items():
-            if header and len(header) > 2:
-                # Add header components as positive indicators
-                header_parts = header.replace('_', ' ').split()
-                for part in header_parts:
-                    if len(part) > 2 and part not in learning_patterns["positive_indicators"]:
-                        learning_patterns["positive_indicators"].append(part)
-        
-        # Limit pattern lists to prevent memory bloat
-        learning_patterns["positive_indicators"] = learning_patterns["positive_indicators"][-100:]
-        learning_patterns["negative_indicators"] = learning_patterns["negative_indicators"][-50:]
+        update_learning_patterns(self.decision_history, ai_result)
     
-    def detect_headers_enhanced(self, sheet_data: Dict[str, Any], file_name: str) -> Dict[str, Any]:
+    def collect_candidates(self, sheet_data: Dict[str, Any], file_name: str) -> Tuple[Dict[str, int], List[Dict[str, Any]]]:
         """
-        Run all 5 detection strategies and return the best result.
+        Run strategies 1-4 and return (strategy result counts, unique candidates ranked by score).
         """
-        print(f"🔍 Running enhanced header detection for {file_name}")
+        # Extract candidate row values once for all strategies
+        rows = self.scan_rows(sheet_data)
         
         # Strategy 1: Pattern-based detection
-        strategy1_results = self.strategy_1_pattern_based(sheet_data)
+        strategy1_results = self.strategy_1_pattern_based(sheet_data, rows)
         
         # Strategy 2: Structural analysis
-        strategy2_results = self.strategy_2_structural_analysis(sheet_data)
+        strategy2_results = self.strategy_2_structural_analysis(sheet_data, rows)
         
         # Strategy 3: Template pattern recognition
-        strategy3_results = self.strategy_3_template_pattern(sheet_data)
+        strategy3_results = self.strategy_3_template_pattern(sheet_data, rows)
         
         # Strategy 4: Historical learning
-        strategy4_results = self.strategy_4_historical_learning(sheet_data, file_name)
+        strategy4_results = self.strategy_4_historical_learning(sheet_data, file_name, rows)
         
         # Combine and rank all candidates
         all_candidates = []
@@ -553,24 +740,76 @@ Please provide your analysis in JSON format.
                 unique_candidates.append(candidate)
                 seen_rows.add(candidate["row_index"])
         
-        # Strategy 5: OpenAI validation
-        openai_result = self.strategy_5_openai_validation(sheet_data, file_name, unique_candidates[:3])
+        strategy_counts = {
+            "pattern_based": len(strategy1_results),
+            "structural": len(strategy2_results),
+            "template_pattern": len(strategy3_results),
+            "historical_learning": len(strategy4_results)
+        }
         
-        # Return comprehensive result
+        return strategy_counts, unique_candidates
+    
+    def build_detection_result(self, file_name: str, strategy_counts: Dict[str, int],
+                               candidates: List[Dict[str, Any]], openai_result: Dict[str, Any]) -> Dict[str, Any]:
+        """Assemble the detection result returned to callers."""
         return {
             "file_name": file_name,
-            "strategy_results": {
-                "pattern_based": len(strategy1_results),
-                "structural": len(strategy2_results),
-                "template_pattern": len(strategy3_results),
-                "historical_learning": len(strategy4_results)
-            },
-            "candidates": unique_candidates[:5],
+            "strategy_results": strategy_counts,
+            "candidates": candidates[:5],
             "openai_validation": openai_result,
             "final_mapping": openai_result.get("validated_mapping", {}),
             "confidence": openai_result.get("confidence", 0.0)
         }
     
+    def detect_headers_enhanced(self, sheet_data: Dict[str, Any], file_name: str) -> Dict[str, Any]:
+        """
+        Run all 5 detection strategies and return the best result.
+        """
+        print(f"🔍 Running enhanced header detection for {file_name}")
+        
+        strategy_counts, unique_candidates = self.collect_candidates(sheet_data, file_name)
+        
+        # Strategy 5: OpenAI validation
+        openai_result = self.strategy_5_openai_validation(sheet_data, file_name, unique_candidates[:3])
+        
+        # Return comprehensive result
+        return self.build_detection_result(file_name, strategy_counts, unique_candidates, openai_result)
+    
+    def detect_headers_enhanced_batch(self, sheets: Dict[str, Dict[str, Any]], file_name: str,
+                                      batch_size: int = 8) -> Dict[str, Dict[str, Any]]:
+        """
+        Run all 5 detection strategies for every sheet of a file, validating the sheets
+        with one OpenAI request per batch of `batch_size` sheets instead of one per sheet.
+        
+        Returns {sheet_name: result} with the same result format as detect_headers_enhanced.
+        """
+        print(f"🔍 Running batched enhanced header detection for {file_name} ({len(sheets)} sheets)")
+        
+        collected = {
+            sheet_name: self.collect_candidates(sheet_data, file_name)
+            for sheet_name, sheet_data in sheets.items()
+        }
+        
+        sheet_names = list(sheets.keys())
+        batches = [
+            {name: (sheets[name], collected[name][1][:3]) for name in sheet_names[start:start + batch_size]}
+            for start in range(0, len(sheet_names), batch_size)
+        ]
+        
+        # Batches are independent network round-trips, so send them concurrently
+        with ThreadPoolExecutor(max_workers=max(1, min(4, len(batches)))) as executor:
+            batch_results = list(executor.map(
+                lambda batch: self.strategy_5_openai_validation_batch(batch, file_name), batches
+            ))
+        
+        results = {}
+        for batch, openai_results in zip(batches, batch_results):
+            for name in batch:
+                strategy_counts, candidates = collected[name]
+                results[name] = self.build_detection_result(file_name, strategy_counts, candidates, openai_results[name])
+        
+        return results
+    
     def extract_clean_headers(self, sheet_data: Dict[str, Any], row_idx: int) -> Dict[str, str]:
         """Extract and clean headers from a specific row."""
         if row_idx >= len(sheet_data.get('data', [])):
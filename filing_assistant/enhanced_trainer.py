@@ -354,31 +354,21 @@ def enhanced_learn_from_pair(empty_file, filled_file, target_sheet=None, verbose
 
     return all_results
 
-def enhanced_merge_patterns(store1: Dict[str, Any], store2: Dict[str, Any]) -> Dict[str, Any]:
+def enhanced_merge_patterns(store: Dict[str, Any], *incoming: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Enhanced pattern merging that combines value patterns and improves confidence scores
+    Enhanced pattern merging that combines value patterns and improves confidence scores.
+    All incoming stores are merged in one pass, later ones taking precedence.
     """
     from .store import merge_patterns
     
     # Start with standard merge
-    merged = merge_patterns(store1, store2)
+    merged = merge_patterns(store, *incoming)
     
-    # Enhance with pattern data
-    for sheet_name, sheet_data in store2.get("sheets", {}).items():
-        if sheet_name in merged.get("sheets", {}):
-            # Merge enhanced patterns
+    # Enhance with pattern data; a later store's patterns replace an earlier one's per column
+    for other in incoming:
+        for sheet_name, sheet_data in other.get("sheets", {}).items():
             enhanced_patterns = sheet_data.get("enhanced_patterns", {})
             if enhanced_patterns:
-                if "enhanced_patterns" not in merged["sheets"][sheet_name]:
-                    merged["sheets"][sheet_name]["enhanced_patterns"] = {}
-                
-                for col, patterns in enhanced_patterns.items():
-                    if col in merged["sheets"][sheet_name]["enhanced_patterns"]:
-                        # Merge pattern data (e.g., combine value samples)
-                        existing = merged["sheets"][sheet_name]["enhanced_patterns"][col]
-                        # Add logic to merge patterns intelligently
-                        merged["sheets"][sheet_name]["enhanced_patterns"][col] = patterns
-                    else:
-                        merged["sheets"][sheet_name]["enhanced_patterns"][col] = patterns
+                merged["sheets"][sheet_name].setdefault("enhanced_patterns", {}).update(enhanced_patterns)
     
     return merged
@@ -1,7 +1,8 @@
 from __future__ import annotations
 from typing import Dict, List, Any, Optional, Tuple
-import json, re, os, sys
+import re, os, sys
 from .schema import normalize
+from .store import read_json
 
 # Import enhanced header detector with fallback
 try:
@@ -12,8 +13,7 @@ except ImportError:
     EnhancedHeaderDetector = None
 
 def load_json(path: str) -> Dict[str, Any]:
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return read_json(path)
 
 def detect_header_row(sheet_obj: Dict[str, Any]) -> Tuple[List[str], int]:
     """Return (headers, header_row_index_in_data).
@@ -1,31 +1,129 @@
 from __future__ import annotations
-from typing import Dict, Any
-import json, os
+from typing import Dict, Any, Tuple
+import json, math, os
 from copy import deepcopy
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+def loads_json(raw: bytes) -> Any:
+    """Decode JSON bytes with orjson when installed, falling back to the json module."""
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # json also accepts bare NaN/Infinity tokens, which orjson rejects
+            pass
+    return json.loads(raw)
+
+def read_json(path: str) -> Any:
+    """Parse a JSON file with orjson when installed, falling back to the json module."""
+    with open(path, "rb") as f:
+        return loads_json(f.read())
+
+def _has_non_finite(obj: Any) -> bool:
+    """True if obj holds a NaN or infinite float anywhere."""
+    if isinstance(obj, float):
+        return not math.isfinite(obj)
+    if isinstance(obj, dict):
+        return any(_has_non_finite(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return any(_has_non_finite(v) for v in obj)
+    return False
+
+def dump_json(obj: Any, indent: bool = True) -> bytes:
+    """Serialize obj as UTF-8 JSON, with orjson when installed; indent=False gives one compact line.
+
+    NaN and Infinity are written as json writes them, so loads_json reads them back unchanged."""
+    if ORJSON_AVAILABLE:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        try:
+            raw = orjson.dumps(obj, option=option)
+            # orjson writes non-finite floats as null; only then is the slower scan needed
+            if b"null" not in raw or not _has_non_finite(obj):
+                return raw
+        except orjson.JSONEncodeError:
+            # e.g. integers wider than 64 bits, which json can still write
+            pass
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def write_json(path: str, obj: Any) -> None:
+    """Write obj as indented UTF-8 JSON, with orjson when installed."""
+    with open(path, "wb") as f:
+        f.write(dump_json(obj))
+
 def load_store(path: str) -> Dict[str, Any]:
     if not os.path.exists(path):
         return {"sheets": {}}
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return read_json(path)
+
+# path -> ((st_mtime_ns, st_size), store) for the last version of each store file read
+_store_cache: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+
+def load_store_cached(path: str) -> Dict[str, Any]:
+    """load_store, memoized per path until the file's mtime or size changes.
+
+    The returned dict is shared between callers and must not be modified; use load_store
+    to get a store that will be edited and saved."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return load_store(path)
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _store_cache.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    store = load_store(path)
+    _store_cache[path] = (key, store)
+    return store
 
 def save_store(path: str, obj: Dict[str, Any]) -> None:
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(obj, f, indent=2, ensure_ascii=False)
+    """Write the store, leaving the file untouched when its contents would not change.
+
+    Retraining on the same pairs then costs a read instead of a rewrite, and the
+    unchanged mtime keeps load_store_cached entries valid."""
+    payload = dump_json(obj)
+    try:
+        if os.path.getsize(path) == len(payload):
+            with open(path, "rb") as f:
+                if f.read() == payload:
+                    return
+    except OSError:
+        pass
+    with open(path, "wb") as f:
+        f.write(payload)
+
+def merge_patterns(store: Dict[str, Any], *incoming: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge learned stores into a copy of store, in order.
 
-def merge_patterns(store: Dict[str, Any], incoming: Dict[str, Any]) -> Dict[str, Any]:
+    Header variants and fill columns are collected as sets across all incoming stores and
+    sorted once at the end, so merging N stores copies the store once instead of N times."""
     out = deepcopy(store)
-    for sheet, payload in incoming.get("sheets", {}).items():
-        target = out["sheets"].setdefault(sheet, {"header_map": {}, "columns_to_fill": [], "column_positions": {}, "verifications": {}})
-        for norm, variants in payload.get("header_map", {}).items():
-            tgtset = set(target["header_map"].get(norm, []))
-            tgtset.update(variants)
-            target["header_map"][norm] = sorted(tgtset)
-        merged = set(target.get("columns_to_fill", []))
-        merged.update(payload.get("columns_to_fill", []))
-        target["columns_to_fill"] = sorted(merged)
-        for norm, pos in payload.get("column_positions", {}).items():
-            target["column_positions"][norm] = pos
-        for raw, v in payload.get("verifications", {}).items():
-            target["verifications"][raw] = v
+    header_sets: Dict[str, Dict[str, set]] = {}
+    fill_sets: Dict[str, set] = {}
+    for other in incoming:
+        for sheet, payload in other.get("sheets", {}).items():
+            target = out["sheets"].setdefault(sheet, {"header_map": {}, "columns_to_fill": [], "column_positions": {}, "verifications": {}})
+            sheet_headers = header_sets.setdefault(sheet, {})
+            for norm, variants in payload.get("header_map", {}).items():
+                if norm not in sheet_headers:
+                    sheet_headers[norm] = set(target["header_map"].get(norm, []))
+                sheet_headers[norm].update(variants)
+            if sheet not in fill_sets:
+                fill_sets[sheet] = set(target.get("columns_to_fill", []))
+            fill_sets[sheet].update(payload.get("columns_to_fill", []))
+            for norm, pos in payload.get("column_positions", {}).items():
+                target["column_positions"][norm] = pos
+            for raw, v in payload.get("verifications", {}).items():
+                target["verifications"][raw] = v
+    for sheet, sheet_headers in header_sets.items():
+        for norm, variants in sheet_headers.items():
+            out["sheets"][sheet]["header_map"][norm] = sorted(variants)
+        out["sheets"][sheet]["columns_to_fill"] = sorted(fill_sets[sheet])
     return out